@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# Cubo de tempos de espera: uma linha por célula das dimensões abaixo, com a
+# contagem, a soma e a soma dos quadrados dos dias de espera e o histograma dos
+# dias da célula (HIST_CLASSES/HIST_N, só as classes com pacientes). Somando as
+# células obtêm-se média, desvio padrão, quantis e proporções sem voltar aos
+# pacientes. O nome da unidade não entra na chave: vem de hospitais.py ao
+# carregar o cubo (filtro.completar_tipos)
+DIMENSOES_CUBO = [
+    'ANO_FAV', 'MES_FAV', 'ACESSO_VASCULAR_INICIAL', 'CRONICO_3_MESES',
+    'SEXO', 'FAIXA_ETARIA', 'RACA_COR', 'COD_UNIDADE_HOSPITALAR'
+]
+
+# Mesmo intervalo de tempos válidos de filtro.load_and_filter_data; pacientes
+# fora dele não entram no cubo
+ESPERA_MIN_DIAS = 0
+ESPERA_MAX_DIAS = 730
+
+# Com classes de 1 dia o histograma é exato (os tempos são inteiros) e os quantis
+# coincidem com os do pandas; classes maiores reduzem os histogramas, com quantis aproximados
+LARGURA_CLASSE_DIAS = 1
+N_CLASSES = ESPERA_MAX_DIAS // LARGURA_CLASSE_DIAS + 1
+
+def construir_cubo(df, largura_classe=LARGURA_CLASSE_DIAS):
+    dias = df['TEMPO_ESPERA_DIAS'].astype('float64')
+    validos = ((dias >= ESPERA_MIN_DIAS) & (dias <= ESPERA_MAX_DIAS)).to_numpy()
+    dados = df.loc[validos, DIMENSOES_CUBO].copy()
+    dias = dias[validos]
+    dados['SOMA'] = dias
+    dados['SOMA_QUADRADOS'] = dias ** 2
+
+    # dropna=False: pacientes sem faixa etária ou sexo continuam nos totais
+    agrupado = dados.groupby(DIMENSOES_CUBO, dropna=False, observed=True, sort=False)
+    cubo = (
+        agrupado
+        .agg(N=('SOMA', 'size'), SOMA=('SOMA', 'sum'), SOMA_QUADRADOS=('SOMA_QUADRADOS', 'sum'))
+        .reset_index()
+    )
+    cubo['N'] = cubo['N'].astype('int32')
+    if cubo.empty:
+        cubo['HIST_CLASSES'] = cubo['HIST_N'] = pd.Series(dtype=object)
+        return cubo
+
+    # Histograma de cada célula: pares (célula, classe) ordenados e contados,
+    # depois divididos nas fronteiras entre células
+    celula = agrupado.ngroup().to_numpy()
+    classe = (dias.to_numpy() // largura_classe).astype('int64')
+    pares, contagens = np.unique(celula * N_CLASSES + classe, return_counts=True)
+    fronteiras = np.flatnonzero(np.diff(pares // N_CLASSES)) + 1
+    cubo['HIST_CLASSES'] = np.split((pares % N_CLASSES * largura_classe).astype('int16'), fronteiras)
+    cubo['HIST_N'] = np.split(contagens.astype('int32'), fronteiras)
+    return cubo
+
+def filtrar_cubo(cubo, filtros_acesso, filtro_cronico, anos_selecionados, meses_selecionados):
+    # Mesmos filtros globais de filtro.load_and_filter_data, aplicados às células
+    mascara = (
+        cubo['ACESSO_VASCULAR_INICIAL'].isin(filtros_acesso) &
+        cubo['ANO_FAV'].isin(anos_selecionados) &
+        cubo['MES_FAV'].isin(meses_selecionados)
+    )
+    if filtro_cronico:
+        mascara &= cubo['CRONICO_3_MESES'] == True
+    return cubo[mascara]
+
+def resumir_cubo(cubo, por=None, limite_espera=180):
+    # Estatísticas do tempo de espera por grupo (ou no total, se por=None)
+    # obtidas somando as células; os quantis usam interpolação linear como o pandas
+    por = list(por or [])
+    colunas = por + ['N', 'Media', 'Mediana', 'Desvio_Padrao', 'P25', 'P75', 'Prop_Acima_180']
+    if por:
+        agrupado = cubo.groupby(por, observed=True)
+        # ngroup marca as células com chave ausente como NaN
+        grupo = np.nan_to_num(agrupado.ngroup().to_numpy(dtype='float64'), nan=-1).astype('int64')
+        resumo = agrupado.size().reset_index()[por]
+    else:
+        grupo = np.zeros(len(cubo), dtype='int64')
+        resumo = pd.DataFrame(index=[0])
+    # Essas células ficam fora dos grupos, como no groupby
+    celulas = grupo >= 0
+    if not celulas.any() or cubo['N'].to_numpy()[celulas].sum() == 0:
+        return pd.DataFrame(columns=colunas)
+    grupo = grupo[celulas]
+    n_grupos = len(resumo)
+
+    total = np.bincount(grupo, weights=cubo['N'].to_numpy()[celulas], minlength=n_grupos)
+    soma = np.bincount(grupo, weights=cubo['SOMA'].to_numpy()[celulas], minlength=n_grupos)
+    soma_quadrados = np.bincount(
+        grupo, weights=cubo['SOMA_QUADRADOS'].to_numpy()[celulas], minlength=n_grupos
+    )
+
+    # Histograma denso grupo × classe a partir dos histogramas das células
+    hist_classes = cubo['HIST_CLASSES'].to_numpy()[celulas]
+    hist_n = cubo['HIST_N'].to_numpy()[celulas]
+    tamanhos = np.fromiter((len(h) for h in hist_n), dtype='int64', count=len(hist_n))
+    classes = np.concatenate(hist_classes).astype('int64')
+    largura = max(int(classes.max()) + 1, 1)
+    hist = np.bincount(
+        np.repeat(grupo, tamanhos) * largura + classes,
+        weights=np.concatenate(hist_n),
+        minlength=n_grupos * largura
+    ).reshape(n_grupos, largura)
+    acumulado = np.cumsum(hist, axis=1)
+    valores_classe = np.arange(largura, dtype='float64')
+    acima = hist[:, valores_classe > limite_espera].sum(axis=1)
+
+    def quantil(q):
+        # Classe da k-ésima observação de cada grupo: primeira com acumulado > k
+        posicao = (total - 1) * q
+        baixo = np.floor(posicao)
+        alto = np.minimum(baixo + 1, total - 1)
+        valor_baixo = (acumulado <= baixo[:, None]).sum(axis=1)
+        valor_alto = (acumulado <= alto[:, None]).sum(axis=1)
+        return valor_baixo + (valor_alto - valor_baixo) * (posicao - baixo)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variancia = (soma_quadrados - soma ** 2 / total) / (total - 1)
+        resumo['N'] = total.astype(int)
+        resumo['Media'] = soma / total
+        resumo['Mediana'] = quantil(0.5)
+        resumo['Desvio_Padrao'] = np.sqrt(np.clip(variancia, 0, None))
+        resumo['P25'] = quantil(0.25)
+        resumo['P75'] = quantil(0.75)
+        resumo['Prop_Acima_180'] = acima / total * 100
+    resumo = resumo[total > 0]
+    return resumo[colunas].reset_index(drop=True)
+
+def grade_mensal(mes, codigos, n_categorias, n, soma):
+    # Média por mês × categoria num array denso (mês na linha, categoria na
+    # coluna), somando as células com um único bincount sobre o índice achatado;
+    # células sem pacientes ficam NaN
+    validos = codigos >= 0
+    indice = mes[validos] * n_categorias + codigos[validos]
+    tamanho = (mes.max() + 1) * n_categorias
+    contagem = np.bincount(indice, weights=n[validos], minlength=tamanho).reshape(-1, n_categorias)
+    total = np.bincount(indice, weights=soma[validos], minlength=tamanho).reshape(-1, n_categorias)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(contagem > 0, total / contagem, np.nan)
+
+def series_mensais(cubo, grupos=()):
+    # Tempo médio mensal no total (chave None) e por categoria de cada coluna de
+    # `grupos`, em formato longo para o gráfico (MES_ANO, categoria,
+    # TEMPO_ESPERA_DIAS), com o pico de cada categoria obtido por argmax
+    ano = cubo['ANO_FAV'].to_numpy(dtype='int64')
+    mes = ano * 12 + cubo['MES_FAV'].to_numpy(dtype='int64') - 1
+    primeiro = int(mes.min())
+    mes = mes - primeiro
+    calendario = pd.date_range(
+        pd.Timestamp(year=primeiro // 12, month=primeiro % 12 + 1, day=1),
+        periods=int(mes.max()) + 1, freq='MS'
+    )
+    n = cubo['N'].to_numpy(dtype='float64')
+    soma = cubo['SOMA'].to_numpy(dtype='float64')
+
+    def montar(medias, categorias=None, grupo=None):
+        # Linhas em ordem de mês e, dentro do mês, de categoria, como no groupby
+        linha, coluna = np.nonzero(~np.isnan(medias))
+        serie = pd.DataFrame({'MES_ANO': calendario[linha]})
+        if grupo:
+            serie[grupo] = pd.Categorical.from_codes(coluna, dtype=categorias)
+        serie['TEMPO_ESPERA_DIAS'] = medias[linha, coluna]
+
+        # Pico de cada categoria com dados (o primeiro mês, em caso de empate)
+        com_dados = ~np.isnan(medias).all(axis=0)
+        mes_pico = np.where(np.isnan(medias), -np.inf, medias).argmax(axis=0)[com_dados]
+        codigos_pico = np.flatnonzero(com_dados)
+        picos = pd.DataFrame({'MES_ANO': calendario[mes_pico]})
+        if grupo:
+            picos[grupo] = pd.Categorical.from_codes(codigos_pico, dtype=categorias)
+        picos['TEMPO_ESPERA_DIAS'] = medias[mes_pico, codigos_pico]
+        return {'serie': serie, 'picos': picos}
+
+    series = {None: montar(grade_mensal(mes, np.zeros(len(mes), dtype='int64'), 1, n, soma))}
+    for grupo in grupos:
+        categorias = cubo[grupo].astype('category')
+        medias = grade_mensal(
+            mes, categorias.cat.codes.to_numpy(dtype='int64'), len(categorias.cat.categories), n, soma
+        )
+        series[grupo] = montar(medias, categorias.dtype, grupo)
+    return series
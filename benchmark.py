@@ -0,0 +1,148 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import dados
+from gerar_apac_sintetico import gerar_apac
+from instrumentacao import pico_memoria_mb, reiniciar_pico_memoria
+
+# Mede o tempo de cada etapa de dados.py e de filtro.load_and_filter_data sobre
+# arquivos APAC sintéticos (gerar_apac_sintetico.py) e acrescenta o resultado,
+# uma linha JSON por execução, ao arquivo de resultados, para comparar versões.
+
+ARQUIVO_RESULTADOS = './resultados_benchmark.jsonl'
+
+class Cronometro:
+    # Tempo e pico de memória por etapa. Cada intervalo medido zera o pico do
+    # processo (instrumentacao.reiniciar_pico_memoria), então os intervalos não
+    # devem ser aninhados; onde o pico não pode ser zerado (fora do Linux), o
+    # valor é o pico desde o início do processo e a etapa é marcada como tal
+    def __init__(self):
+        self.etapas = {}
+        self.pico_total_mb = None
+
+    @contextlib.contextmanager
+    def medir(self, etapa):
+        pico_por_etapa = reiniciar_pico_memoria()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.acumular(etapa, time.perf_counter() - inicio, pico_por_etapa)
+
+    def acumular(self, etapa, segundos, pico_por_etapa):
+        registro = self.etapas.setdefault(etapa, {'segundos': 0.0, 'pico_rss_mb': None})
+        registro['segundos'] += segundos
+        pico = pico_memoria_mb()
+        if pico is not None:
+            registro['pico_rss_mb'] = round(max(registro['pico_rss_mb'] or 0, pico), 1)
+            self.pico_total_mb = max(self.pico_total_mb or 0, pico)
+        registro['pico_desde_inicio'] = not pico_por_etapa
+
+def medir_pipeline(cronometro, pasta, processos=1):
+    caminho_saida = os.path.join(pasta, 'dados_finais_para_dashboard.csv')
+    arquivos = [(os.path.join(pasta, 'ATDRS.csv'), dados.COLUNAS_APAC['dialise']),
+                (os.path.join(pasta, 'ACFRS.csv'), dados.COLUNAS_APAC['fav'])]
+    if processos <= 1:
+        # Leitura do CSV, filtro do município e limpeza, tipos e chave composta
+        # medidos separadamente, somando os lotes
+        df_dialise, df_fav = dados.ler_apacs(arquivos, medir=cronometro.medir)
+    else:
+        # Os passos rodam nos processos filhos: só o total da leitura é medido
+        with cronometro.medir('leitura'):
+            df_dialise, df_fav = dados.ler_apacs(arquivos, processos=processos)
+
+    with cronometro.medir('verificacao_chave'):
+        dados.verificar_colisoes_chave(df_dialise, df_fav)
+    with cronometro.medir('preparacao'):
+        df_dialise_chave = dados.preparar_dialise(df_dialise)
+        df_fav_chave = dados.preparar_fav(df_fav)
+    with cronometro.medir('primeiro_evento'):
+        df_primeira_dialise = dados.selecionar_primeira_dialise(df_dialise_chave)
+    with cronometro.medir('merge'):
+        df_primeira_fav = dados.selecionar_primeira_fav(df_primeira_dialise, df_fav_chave)
+    with cronometro.medir('enriquecimento'):
+        df_para_dashboard = dados.montar_base_dashboard(df_primeira_fav)
+    with cronometro.medir('gravacao'), contextlib.redirect_stdout(io.StringIO()):
+        dados.gravar_saidas(df_para_dashboard, caminho_saida)
+    return caminho_saida, len(df_para_dashboard)
+
+def medir_filtro(cronometro, caminho_saida):
+    # Importado aqui: filtro depende do streamlit, usado fora do servidor
+    import filtro
+
+    filtro.carregar_base.clear()
+    filtro.cache_filtros.clear()
+    with cronometro.medir('filtro_primeira_carga'):
+        _, _, anos, _ = filtro.load_and_filter_data(caminho_saida)
+    with cronometro.medir('filtro_repetido'):
+        filtro.load_and_filter_data(caminho_saida)
+    with cronometro.medir('filtro_novo'):
+        filtro.load_and_filter_data(caminho_saida, filtro_cronico_default=False, anos_selecionados=anos[-3:])
+
+def versao_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline dados.py e do filtro do dashboard.")
+    parser.add_argument('--linhas', type=int, default=100_000, help="Linhas do ATDRS sintético")
+    parser.add_argument('--semente', type=int, default=0, help="Semente do gerador")
+    parser.add_argument('--pasta', default=None, help="Pasta dos arquivos sintéticos (padrão: ./dados_sinteticos/<linhas>_<semente>)")
+    parser.add_argument('--resultados', default=ARQUIVO_RESULTADOS, help="Arquivo JSON Lines onde os resultados são acrescentados")
+    parser.add_argument('--processos', type=int, default=1, help="Processos da leitura paralela (como em dados.py)")
+    parser.add_argument('--descricao', default='', help="Texto livre gravado junto ao resultado")
+    args = parser.parse_args()
+
+    pasta = args.pasta or os.path.join('dados_sinteticos', f'{args.linhas}_{args.semente}')
+    if not os.path.exists(os.path.join(pasta, 'ATDRS.csv')):
+        print(f"Gerando arquivos sintéticos em {pasta}...")
+        gerar_apac(pasta, args.linhas, args.semente)
+
+    cronometro = Cronometro()
+    inicio = time.perf_counter()
+    caminho_saida, linhas_saida = medir_pipeline(cronometro, pasta, args.processos)
+    if linhas_saida:
+        medir_filtro(cronometro, caminho_saida)
+
+    resultado = {
+        'data_hora': datetime.now().isoformat(timespec='seconds'),
+        'versao': versao_codigo(),
+        'descricao': args.descricao,
+        'linhas': args.linhas,
+        'semente': args.semente,
+        'processos': args.processos,
+        'bytes_entrada': sum(os.path.getsize(os.path.join(pasta, arq)) for arq in ('ATDRS.csv', 'ACFRS.csv')),
+        'linhas_saida': linhas_saida,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'segundos_total': round(time.perf_counter() - inicio, 3),
+        'pico_rss_mb': round(max(cronometro.pico_total_mb or 0, pico_memoria_mb() or 0), 1),
+        'etapas': {etapa: {**registro, 'segundos': round(registro['segundos'], 3)} for etapa, registro in cronometro.etapas.items()},
+    }
+    with open(args.resultados, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+
+    print(f"{'Etapa':<24}{'Segundos':>10}{'Pico RSS (MB)':>16}")
+    for etapa, registro in resultado['etapas'].items():
+        print(f"{etapa:<24}{registro['segundos']:>10.3f}{registro['pico_rss_mb'] or float('nan'):>16.1f}")
+    print(f"{'total':<24}{resultado['segundos_total']:>10.3f}{resultado['pico_rss_mb']:>16.1f}")
+    if args.processos > 1:
+        print("O pico de memória da leitura é só o do processo principal (sem os processos filhos).")
+    print(f"Resultado acrescentado a {args.resultados}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# Categorias fixas das colunas de baixa cardinalidade da base do dashboard. As
+# mesmas listas geram os rótulos em dados.py e os tipos usados no carregamento,
+# de modo que cada coluna é um Categorical (códigos int8) com ordem estável;
+# faixas etárias seguem a ordem clínica.
+
+FAIXAS_ETARIAS = ['18-30 anos', '31-45 anos', '46-60 anos', '60+ anos']
+SEXOS = ['Feminino', 'Masculino']
+RACAS_COR = ['Branca', 'Preta', 'Parda', 'Amarela', 'Indígena', 'Não Informada']
+ACESSOS_VASCULARES = [
+    'Fístula Arteriovenosa (FAV)', 'Cateter Duplo Lúmen', 'Cateter Permanente (Permcath)',
+    'Outros', 'Não Informado'
+]
+
+TIPOS_CATEGORICOS = {
+    'SEXO': pd.CategoricalDtype(SEXOS),
+    'RACA_COR': pd.CategoricalDtype(RACAS_COR),
+    'FAIXA_ETARIA': pd.CategoricalDtype(FAIXAS_ETARIAS, ordered=True),
+    'ACESSO_VASCULAR_INICIAL': pd.CategoricalDtype(ACESSOS_VASCULARES),
+}
+# Opção dos filtros que seleciona as linhas sem valor na coluna
+ROTULO_AUSENTE = "Não informado"
+
+# Colunas categóricas cujas categorias vêm dos próprios dados
+COLUNAS_CATEGORICAS_ABERTAS = [
+    'MUN_RESIDENCIA_COD', 'MUN_RESIDENCIA_NOME', 'COD_UNIDADE_HOSPITALAR', 'NOME_HOSPITAL'
+]
+
+def tipo_com_extras(serie, tipo):
+    # Valores fora da lista fixa entram no fim, em vez de virarem ausentes
+    valores = serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else serie.dropna().unique()
+    extras = pd.Index(valores).difference(tipo.categories)
+    if extras.empty:
+        return tipo
+    return pd.CategoricalDtype(list(tipo.categories) + sorted(extras, key=str), ordered=tipo.ordered)
+
+def aplicar_categorias(df):
+    # Converte in place as colunas presentes em df
+    for coluna, tipo in TIPOS_CATEGORICOS.items():
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(tipo_com_extras(df[coluna], tipo))
+    for coluna in COLUNAS_CATEGORICAS_ABERTAS:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+    return df
+
+def categorias_presentes(serie, incluir_ausentes=False):
+    # Categorias com pelo menos uma linha, na ordem do tipo (contagem pelos
+    # códigos); com incluir_ausentes, ROTULO_AUSENTE no fim se houver linhas sem valor
+    codigos = serie.cat.codes.to_numpy()
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(serie.cat.categories))
+    presentes = serie.cat.categories[contagens > 0].tolist()
+    if incluir_ausentes and (codigos < 0).any():
+        presentes.append(ROTULO_AUSENTE)
+    return presentes
+
+def mascara_categorias(serie, selecionadas):
+    # Linhas cuja categoria está em `selecionadas`, comparando códigos inteiros;
+    # linhas sem valor só entram se ROTULO_AUSENTE estiver selecionado
+    selecionadas = list(selecionadas)
+    codigos_selecionados = serie.cat.categories.get_indexer(selecionadas)
+    codigos = serie.cat.codes.to_numpy()
+    mascara = np.isin(codigos, codigos_selecionados[codigos_selecionados >= 0])
+    if ROTULO_AUSENTE in selecionadas:
+        mascara |= codigos < 0
+    return mascara
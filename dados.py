@@ -1,81 +1,363 @@
 import pandas as pd
 import numpy as np
+import argparse
+import contextlib
 import csv
+import io
+import os
+import platform
+from concurrent.futures import ProcessPoolExecutor
+
+from agregados import construir_cubo
+from instrumentacao import RelatorioExecucao, registrar_descarte
+from manifesto import gravar_manifesto
+from municipios import ARQUIVO_MUNICIPIOS, dimensao_municipios, nomes_municipios
+from hospitais import nomes_hospitais
+from categorias import FAIXAS_ETARIAS, aplicar_categorias
+
+CAMPOS_CHAVE = ['AP_SEXO', 'AP_RACACOR', 'AP_CEPPCN', 'AP_UFNACIO']
+
+COLUNAS_FINAIS = {
+    'ID_PACIENTE_COMPOSTO': 'ID_PACIENTE_COMPOSTO',
+    'DATA_INICIO_DIALISE': 'DATA_INICIO_DIALISE',
+    'DATA_FAV': 'DATA_CRIACAO_FAV',
+    'TEMPO_ESPERA_DIAS': 'TEMPO_ESPERA_DIAS',
+    'ANO_FAV': 'ANO_CRIACAO_FAV',
+    'ANO_INICIO': 'ANO_INICIO',
+    'CRONICO_3_MESES': 'CRONICO_3_MESES',
+    'SEXO': 'SEXO',
+    'RACA_COR': 'RACA_COR',
+    'IDADE': 'IDADE',
+    'FAIXA_ETARIA': 'FAIXA_ETARIA',
+    'AP_MUNPCN_DIALISE': 'MUN_RESIDENCIA_COD',
+    'MUN_RESIDENCIA_NOME': 'MUN_RESIDENCIA_NOME',
+    'ACESSO_VASCULAR_INICIAL': 'ACESSO_VASCULAR_INICIAL',
+    'AP_CODUNI_DIALISE': 'COD_UNIDADE_HOSPITALAR',
+    'NOME_HOSPITAL': 'NOME_HOSPITAL'
+}
+
+# Colunas de origem exigidas em cada arquivo APAC. No ATDRS: as que geram as
+# colunas AP_*_DIALISE de COLUNAS_FINAIS, as usadas para derivar IDADE,
+# SEXO, RACA_COR e ACESSO_VASCULAR_INICIAL e os campos da chave composta.
+# No ACFRS bastam o município, a data e a chave.
+COLUNAS_DERIVADAS_DIALISE = ['AP_NUIDADE', 'AP_SEXO', 'AP_RACACOR', 'ATD_ACEVAS']
+COLUNAS_APAC = {
+    'dialise': list(dict.fromkeys([
+        'AP_UFMUN', 'AP_DTINIC', *CAMPOS_CHAVE, *COLUNAS_DERIVADAS_DIALISE,
+        *(col.removesuffix('_DIALISE') for col in COLUNAS_FINAIS if col.startswith('AP_') and col.endswith('_DIALISE'))
+    ])),
+    'fav': ['AP_UFMUN', 'AP_DTINIC', *CAMPOS_CHAVE],
+}
+# Colunas que o pipeline tolera ausentes (recebem valor padrão na saída)
+COLUNAS_OPCIONAIS = {'AP_CODUNI'}
+
+def normalizar_valores_chave(valores):
+    return pd.Series(valores).astype(str).str.strip().fillna('NA').to_numpy()
+
+def normalizar_campos_chave(df, sufixo=''):
+    return pd.DataFrame(
+        {col: normalizar_valores_chave(df[f'{col}{sufixo}']) for col in CAMPOS_CHAVE},
+        index=df.index
+    )
+
+def combinacoes_chave(df):
+    # Combinações distintas dos campos da chave, já normalizadas, e a posição da
+    # combinação de cada linha. Cada campo é fatorado (nas categorias, pelos
+    # códigos) e só os seus valores distintos são normalizados, de modo que o
+    # texto não é percorrido linha a linha
+    combinacao = np.zeros(len(df), dtype='int64')
+    campos = []
+    for col in CAMPOS_CHAVE:
+        codigos, distintos = pd.factorize(df[col], use_na_sentinel=False)
+        campos.append((col, codigos, normalizar_valores_chave(distintos)))
+        combinacao = pd.factorize(combinacao * len(distintos) + codigos)[0]
+    _, primeira_linha = np.unique(combinacao, return_index=True)
+    combinacoes = pd.DataFrame({col: normalizados[codigos[primeira_linha]] for col, codigos, normalizados in campos})
+    return combinacao, combinacoes
 
 def criar_chave_composta_robusta(df):
-    df_copy = df.copy()
-    campos_chave = ['AP_SEXO', 'AP_RACACOR', 'AP_CEPPCN', 'AP_UFNACIO']
-    for col in campos_chave:
-        df_copy[col] = df_copy[col].astype(str).str.strip().fillna('NA')
-    df_copy['CHAVE_COMPOSTA'] = df_copy[campos_chave].agg('_'.join, axis=1)
-    return df_copy
-
-print("--- Iniciando a Etapa 1: Carregamento dos Dados ---")
-caminho_pasta = './'
-arquivo_dialise = f'{caminho_pasta}ATDRS.csv'
-arquivo_fav = f'{caminho_pasta}ACFRS.csv'
-
-df_dialise = pd.read_csv(
-    arquivo_dialise,
-    sep=';',
-    header=0,
-    encoding='iso-8859-1',
-    engine='python',
-    quoting=csv.QUOTE_NONE,
-    on_bad_lines='warn'
-)
-
-df_fav = pd.read_csv(
-    arquivo_fav,
-    sep=';',
-    header=0,
-    encoding='iso-8859-1',
-    engine='python',
-    quoting=csv.QUOTE_NONE,
-    on_bad_lines='warn'
-)
-
-df_dialise = df_dialise.applymap(lambda x: x.strip('"') if isinstance(x, str) else x)
-df_fav = df_fav.applymap(lambda x: x.strip('"') if isinstance(x, str) else x)
-
-print("✔️ Arquivos carregados e limpos com sucesso!")
-
-df_dialise.columns = df_dialise.columns.str.upper().str.strip().str.replace('"', '')
-df_fav.columns = df_fav.columns.str.upper().str.strip().str.replace('"', '')
-
-df_dialise_poa = df_dialise[df_dialise['AP_UFMUN'].astype(str).str.strip() == '431490'].copy()
-df_fav_poa = df_fav[df_fav['AP_UFMUN'].astype(str).str.strip() == '431490'].copy()
-
-df_dialise_chave = criar_chave_composta_robusta(df_dialise_poa)
-df_fav_chave = criar_chave_composta_robusta(df_fav_poa)
-
-df_dialise_chave['DATA_INICIO_DIALISE'] = pd.to_datetime(df_dialise_chave['AP_DTINIC'], format='%Y%m%d', errors='coerce')
-df_dialise_chave.dropna(subset=['DATA_INICIO_DIALISE', 'CHAVE_COMPOSTA'], inplace=True)
-df_primeira_dialise = df_dialise_chave.loc[df_dialise_chave.groupby('CHAVE_COMPOSTA')['DATA_INICIO_DIALISE'].idxmin()]
-
-df_fav_chave['DATA_FAV'] = pd.to_datetime(df_fav_chave['AP_DTINIC'], format='%Y%m%d', errors='coerce')
-df_fav_chave.dropna(subset=['DATA_FAV', 'CHAVE_COMPOSTA'], inplace=True)
-
-df_merged = pd.merge(df_primeira_dialise, df_fav_chave, on='CHAVE_COMPOSTA', how='inner', suffixes=('_DIALISE', '_FAV'))
-
-if not df_merged.empty:
+    # A chave é um inteiro de 64 bits (hash estável dos campos normalizados), de
+    # modo que groupby e merge operem sobre inteiros; o identificador legível só
+    # é montado para os pacientes da saída (montar_id_paciente)
+    combinacao, combinacoes = combinacoes_chave(df)
+    df['CHAVE_COMPOSTA'] = pd.util.hash_pandas_object(combinacoes, index=False).to_numpy()[combinacao]
+    return df
+
+def verificar_colisoes_chave(*dfs):
+    # Duas combinações diferentes dos campos da chave com o mesmo hash
+    # juntariam pacientes distintos: interrompe o processamento nesse caso.
+    # Só as combinações distintas de cada base são comparadas
+    combinacoes = pd.concat([combinacoes_chave(df)[1] for df in dfs], ignore_index=True).drop_duplicates()
+    hashes = pd.util.hash_pandas_object(combinacoes, index=False)
+    if hashes.duplicated().any():
+        raise ValueError("Colisão de hash entre chaves compostas distintas; não é seguro continuar.")
+
+def montar_id_paciente(df, sufixo=''):
+    campos = normalizar_campos_chave(df, sufixo)
+    return campos[CAMPOS_CHAVE[0]].str.cat([campos[col] for col in CAMPOS_CHAVE[1:]], sep='_')
+
+# Código IBGE de Porto Alegre (6 dígitos, como em AP_UFMUN)
+CODIGO_MUNICIPIO = '431490'
+
+# Um paciente é identificado pela chave composta dentro do município de
+# atendimento, como se cada município fosse processado separadamente
+CHAVES_PACIENTE = ['COD_MUNICIPIO', 'CHAVE_COMPOSTA']
+
+# Número de linhas lidas por vez dos arquivos APAC; o pico de memória depende
+# deste valor e não do tamanho total dos arquivos
+TAMANHO_LOTE = 200_000
+
+# Tamanho das faixas de bytes distribuídas entre os processos na leitura paralela
+TAMANHO_FAIXA_BYTES = 64 * 1024 * 1024
+
+# Tipos declarados para as colunas APAC consumidas pelo pipeline;
+# as demais permanecem como texto
+COLUNAS_CATEGORICAS = ['AP_UFMUN', 'AP_SEXO', 'AP_RACACOR', 'AP_UFNACIO', 'AP_MUNPCN', 'AP_CODUNI', 'ATD_ACEVAS']
+COLUNAS_INTEIRAS = {'AP_NUIDADE': 'Int16'}
+COLUNAS_DATAS = ['AP_DTINIC']
+
+def limpar_aspas(df):
+    for col in df.select_dtypes(include='object').columns:
+        df[col] = df[col].str.strip('"')
+    return df
+
+def tipar_colunas(df):
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col, tipo in COLUNAS_INTEIRAS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(tipo)
+    for col in COLUNAS_DATAS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format='%Y%m%d', errors='coerce')
+    return df
+
+def normalizar_nome_coluna(nome):
+    return nome.upper().strip().replace('"', '')
+
+def validar_colunas_apac(caminho, colunas):
+    cabecalho = pd.read_csv(caminho, sep=';', encoding='iso-8859-1', quoting=csv.QUOTE_NONE, nrows=0)
+    disponiveis = {normalizar_nome_coluna(col) for col in cabecalho.columns}
+    ausentes = [col for col in colunas if col not in disponiveis and col not in COLUNAS_OPCIONAIS]
+    if ausentes:
+        raise ValueError(
+            f"O arquivo {caminho} não contém as colunas obrigatórias: {', '.join(ausentes)}. "
+            "Verifique se o layout do DATASUS foi alterado."
+        )
+
+def opcoes_leitura_apac(colunas, tamanho_lote):
+    return dict(
+        sep=';',
+        encoding='iso-8859-1',
+        engine='c',
+        quoting=csv.QUOTE_NONE,
+        dtype=str,
+        usecols=lambda col: normalizar_nome_coluna(col) in colunas,
+        on_bad_lines='warn',
+        chunksize=tamanho_lote
+    )
+
+def filtrar_lote_apac(lote, codigos_municipio):
+    lote.columns = lote.columns.map(normalizar_nome_coluna)
+    # Filtra o município antes de limpar, para que a limpeza só percorra as linhas mantidas
+    municipio = lote['AP_UFMUN'].str.strip('"').str.strip()
+    return limpar_aspas(lote[municipio.isin(codigos_municipio)].copy())
+
+def chavear_apac(df):
+    # Chave composta e município já na leitura, para que também rodem em paralelo
+    df = criar_chave_composta_robusta(df)
+    df['COD_MUNICIPIO'] = df['AP_UFMUN'].astype(str).astype('int64')
+    return df
+
+def sem_medicao(etapa):
+    return contextlib.nullcontext()
+
+def filtrar_lotes_apac(leitor, codigos_municipio, medir=sem_medicao):
+    # medir(etapa) devolve um gerenciador de contexto que cronometra cada passo
+    # da leitura (benchmark.py); os tempos de cada lote se somam na mesma etapa
+    lotes_filtrados = []
+    linhas_lidas = 0
+    leitor = iter(leitor)
+    while True:
+        with medir('leitura_csv'):
+            lote = next(leitor, None)
+        if lote is None:
+            break
+        linhas_lidas += len(lote)
+        with medir('filtro_limpeza'):
+            lotes_filtrados.append(filtrar_lote_apac(lote, codigos_municipio))
+
+    with medir('filtro_limpeza'):
+        df = pd.concat(lotes_filtrados, ignore_index=True)
+    with medir('tipos'):
+        df = tipar_colunas(df)
+    with medir('chave_composta'):
+        df = chavear_apac(df)
+    # Total de linhas do arquivo (antes do filtro de município), para o relatório de execução
+    df.attrs['linhas_lidas'] = linhas_lidas
+    return df
+
+def ler_faixa_apac(caminho, inicio, fim, nomes_colunas, colunas, codigos_municipio, tamanho_lote):
+    # Lê apenas os bytes [inicio, fim) do arquivo; os limites caem sempre em início de linha
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        dados = arquivo.read(fim - inicio)
+    leitor = pd.read_csv(io.BytesIO(dados), header=None, names=nomes_colunas, **opcoes_leitura_apac(colunas, tamanho_lote))
+    return filtrar_lotes_apac(leitor, codigos_municipio)
+
+def dividir_em_faixas(caminho, tamanho_faixa):
+    # Limites de leitura em bytes, ajustados para o início da linha seguinte
+    with open(caminho, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        tamanho = os.path.getsize(caminho)
+        limites = [len(cabecalho)]
+        while limites[-1] + tamanho_faixa < tamanho:
+            arquivo.seek(limites[-1] + tamanho_faixa)
+            arquivo.readline()
+            if arquivo.tell() >= tamanho:
+                break
+            limites.append(arquivo.tell())
+        limites.append(tamanho)
+    nomes_colunas = cabecalho.decode('iso-8859-1').rstrip('\r\n').split(';')
+    return nomes_colunas, list(zip(limites[:-1], limites[1:]))
+
+def juntar_partes_apac(partes):
+    # Partes lidas em paralelo têm categorias diferentes; a junção segue a ordem
+    # das faixas no arquivo, e as categorias são refeitas sobre o resultado.
+    # Faixas sem linhas do município são descartadas (exceto se todas forem vazias)
+    linhas_lidas = sum(parte.attrs['linhas_lidas'] for parte in partes)
+    partes = [parte for parte in partes if not parte.empty] or partes[:1]
+    df = pd.concat(partes, ignore_index=True)
+    df.attrs['linhas_lidas'] = linhas_lidas
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def ler_apacs(arquivos, codigos_municipio=(CODIGO_MUNICIPIO,), processos=1, tamanho_lote=TAMANHO_LOTE,
+              tamanho_faixa=TAMANHO_FAIXA_BYTES, medir=sem_medicao):
+    # Lê cada (caminho, colunas) de arquivos. Com processos > 1, os arquivos são
+    # divididos em faixas de bytes processadas (filtro, limpeza, tipos e chave)
+    # num pool de processos, e cada arquivo é remontado na ordem original das
+    # faixas, com resultado idêntico ao da leitura sequencial. medir (ver
+    # filtrar_lotes_apac) só é usado na leitura sequencial
+    for caminho, colunas in arquivos:
+        validar_colunas_apac(caminho, colunas)
+    codigos_municipio = list(codigos_municipio)
+
+    if processos <= 1:
+        return [
+            filtrar_lotes_apac(
+                pd.read_csv(caminho, header=0, **opcoes_leitura_apac(set(colunas), tamanho_lote)),
+                codigos_municipio,
+                medir
+            )
+            for caminho, colunas in arquivos
+        ]
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = []
+        for caminho, colunas in arquivos:
+            # Arquivos pequenos também são divididos, para ocupar todos os processos
+            tamanho_faixa_arquivo = max(1, min(tamanho_faixa, -(-os.path.getsize(caminho) // processos)))
+            nomes_colunas, faixas = dividir_em_faixas(caminho, tamanho_faixa_arquivo)
+            futuros.append([
+                executor.submit(ler_faixa_apac, caminho, inicio, fim, nomes_colunas, set(colunas),
+                                codigos_municipio, tamanho_lote)
+                for inicio, fim in faixas
+            ])
+        return [juntar_partes_apac([futuro.result() for futuro in futuros_arquivo]) for futuros_arquivo in futuros]
+
+def preparar_base_colunar(df):
+    # Tipos nativos (datas, categorias fixas de categorias.py e booleanos) e as
+    # colunas ANO_FAV/MES_FAV já derivadas, para que o dashboard não precise
+    # reinterpretar o CSV
+    df_colunar = aplicar_categorias(df.copy())
+    df_colunar['CRONICO_3_MESES'] = df_colunar['CRONICO_3_MESES'].astype(bool)
+    df_colunar['ANO_FAV'] = df_colunar['DATA_CRIACAO_FAV'].dt.year.astype('int16')
+    df_colunar['MES_FAV'] = df_colunar['DATA_CRIACAO_FAV'].dt.month.astype('int8')
+    return df_colunar
+
+def gravar_parquet(df, caminho_parquet):
+    try:
+        df.to_parquet(caminho_parquet, index=False)
+    except ImportError:
+        print(f"AVISO: pyarrow não está instalado; {caminho_parquet} não será gerado.")
+        return None
+    return caminho_parquet
+
+def gravar_base_colunar(df, caminho_csv):
+    # Grava ao lado do CSV a cópia em Parquet da base e o cubo de agregados
+    # usado pelos indicadores do dashboard
+    prefixo = os.path.splitext(caminho_csv)[0]
+    df_colunar = preparar_base_colunar(df)
+    caminho_base = gravar_parquet(df_colunar, f'{prefixo}.parquet')
+    caminho_cubo = gravar_parquet(construir_cubo(df_colunar), f'{prefixo}_cubo.parquet')
+    return caminho_base, caminho_cubo
+
+def preparar_dialise(df_dialise_chave):
+    df_dialise_chave['DATA_INICIO_DIALISE'] = df_dialise_chave['AP_DTINIC']
+    df_dialise_chave.dropna(subset=['DATA_INICIO_DIALISE', 'CHAVE_COMPOSTA'], inplace=True)
+    return df_dialise_chave
+
+def preparar_fav(df_fav_chave):
+    # Do ACFRS só interessam o município, a chave e a data da FAV
+    df_fav_chave['DATA_FAV'] = df_fav_chave['AP_DTINIC']
+    df_fav_chave.dropna(subset=['DATA_FAV', 'CHAVE_COMPOSTA'], inplace=True)
+    return df_fav_chave[CHAVES_PACIENTE + ['DATA_FAV']]
+
+def selecionar_primeira_dialise(df_dialise_chave):
+    # Ordenação estável por chave e data: em empate fica o registro que aparece
+    # primeiro nos arquivos, como no idxmin
+    return (
+        df_dialise_chave
+        .sort_values(CHAVES_PACIENTE + ['DATA_INICIO_DIALISE'], kind='stable')
+        .drop_duplicates(CHAVES_PACIENTE, keep='first')
+    )
+
+def selecionar_primeira_fav(df_primeira_dialise, df_fav_chave):
+    # As colunas do ATDRS recebem o sufixo _DIALISE usado em COLUNAS_FINAIS
+    df_primeira_dialise = df_primeira_dialise.rename(columns={
+        col: f'{col}_DIALISE' for col in df_primeira_dialise.columns if col.startswith('AP_')
+    })
+
+    # Para cada paciente, a primeira FAV estritamente posterior à primeira diálise
+    # (datas em dias, logo espera > 0). O merge_asof percorre as duas tabelas
+    # ordenadas uma única vez e devolve no máximo uma linha por paciente, sem
+    # montar todas as combinações diálise x FAV da chave
+    df_merged = pd.merge_asof(
+        df_primeira_dialise.sort_values('DATA_INICIO_DIALISE', kind='stable'),
+        df_fav_chave.sort_values('DATA_FAV', kind='stable'),
+        left_on='DATA_INICIO_DIALISE',
+        right_on='DATA_FAV',
+        by=CHAVES_PACIENTE,
+        direction='forward',
+        allow_exact_matches=False
+    ).dropna(subset=['DATA_FAV'])
+
     df_merged['TEMPO_ESPERA_DIAS'] = (df_merged['DATA_FAV'] - df_merged['DATA_INICIO_DIALISE']).dt.days
-    df_com_espera = df_merged[df_merged['TEMPO_ESPERA_DIAS'] > 0].copy()
-    df_primeira_fav = df_com_espera.loc[df_com_espera.groupby('CHAVE_COMPOSTA')['TEMPO_ESPERA_DIAS'].idxmin()]
+    return df_merged
+
+def montar_base_dashboard(df_primeira_fav, municipios=None):
+    if df_primeira_fav.empty:
+        return pd.DataFrame()
+
+    df_primeira_fav = df_primeira_fav.copy()
     df_primeira_fav['ANO_FAV'] = df_primeira_fav['DATA_FAV'].dt.year
     df_primeira_fav['ANO_INICIO'] = df_primeira_fav['DATA_INICIO_DIALISE'].dt.year
     df_primeira_fav['CRONICO_3_MESES'] = df_primeira_fav['TEMPO_ESPERA_DIAS'] >= 90
     df_final = df_primeira_fav[(df_primeira_fav['ANO_FAV'] >= 2015) & (df_primeira_fav['ANO_FAV'] <= 2024)].copy()
-else:
-    df_final = pd.DataFrame()
 
-if not df_final.empty:
-    df_final.rename(columns={'CHAVE_COMPOSTA': 'ID_PACIENTE_COMPOSTO'}, inplace=True)
-    df_final['IDADE'] = pd.to_numeric(df_final['AP_NUIDADE_DIALISE'], errors='coerce')
+    if df_final.empty:
+        return pd.DataFrame()
+
+    df_final['ID_PACIENTE_COMPOSTO'] = montar_id_paciente(df_final, sufixo='_DIALISE')
+    df_final.sort_values('ID_PACIENTE_COMPOSTO', kind='stable', inplace=True)
+    df_final['IDADE'] = df_final['AP_NUIDADE_DIALISE']
 
     faixas_etarias = [18, 30, 45, 60, 120]
-    labels_faixas = ['18-30 anos', '31-45 anos', '46-60 anos', '60+ anos']
-    df_final['FAIXA_ETARIA'] = pd.cut(df_final['IDADE'], bins=faixas_etarias, labels=labels_faixas, right=False)
+    df_final['FAIXA_ETARIA'] = pd.cut(df_final['IDADE'], bins=faixas_etarias, labels=FAIXAS_ETARIAS, right=False)
 
     df_final['SEXO'] = df_final['AP_SEXO_DIALISE'].map({'M': 'Masculino', 'F': 'Feminino'})
 
@@ -94,34 +376,268 @@ if not df_final.empty:
     }
     df_final['ACESSO_VASCULAR_INICIAL'] = df_final['ATD_ACEVAS'].astype(str).map(mapa_acesso).fillna('Não Informado')
 
-    if 'AP_CODUNI_DIALISE' not in df_final.columns and 'AP_CODUNI_DIALISE' in df_merged.columns:
-        df_final['AP_CODUNI_DIALISE'] = df_merged['AP_CODUNI_DIALISE']
-
-    colunas_finais = {
-        'ID_PACIENTE_COMPOSTO': 'ID_PACIENTE_COMPOSTO',
-        'DATA_INICIO_DIALISE': 'DATA_INICIO_DIALISE',
-        'DATA_FAV': 'DATA_CRIACAO_FAV',
-        'TEMPO_ESPERA_DIAS': 'TEMPO_ESPERA_DIAS',
-        'ANO_FAV': 'ANO_CRIACAO_FAV',
-        'ANO_INICIO': 'ANO_INICIO',
-        'CRONICO_3_MESES': 'CRONICO_3_MESES',
-        'SEXO': 'SEXO',
-        'RACA_COR': 'RACA_COR',
-        'IDADE': 'IDADE',
-        'FAIXA_ETARIA': 'FAIXA_ETARIA',
-        'AP_MUNPCN_DIALISE': 'MUN_RESIDENCIA_COD',
-        'ACESSO_VASCULAR_INICIAL': 'ACESSO_VASCULAR_INICIAL',
-        'AP_CODUNI_DIALISE': 'COD_UNIDADE_HOSPITALAR'
-    }
+    # Nome do município de residência, resolvido pela dimensão de municípios
+    df_final['MUN_RESIDENCIA_NOME'] = nomes_municipios(df_final['AP_MUNPCN_DIALISE'], municipios)
 
     if 'AP_CODUNI_DIALISE' not in df_final.columns:
         df_final['AP_CODUNI_DIALISE'] = 'Desconhecido'
+    # Nome da unidade pela referência do CNES (hospitais_cnes.csv)
+    df_final['NOME_HOSPITAL'] = nomes_hospitais(df_final['AP_CODUNI_DIALISE'])
+
+    return df_final[list(COLUNAS_FINAIS.keys())].rename(columns=COLUNAS_FINAIS)
 
-    df_para_dashboard = df_final[list(colunas_finais.keys())].rename(columns=colunas_finais)
+def gravar_saidas(df_para_dashboard, caminho_saida):
+    if df_para_dashboard.empty:
+        print("\nAVISO: Não foram encontrados pacientes que atendam a todos os critérios. O arquivo final não será gerado.")
+        return
 
-    caminho_saida = './dados_finais_para_dashboard.csv'
     df_para_dashboard.to_csv(caminho_saida, index=False, encoding='utf-8')
+    caminho_saida_colunar, caminho_saida_cubo = gravar_base_colunar(df_para_dashboard, caminho_saida)
+    caminho_saida_manifesto = gravar_manifesto(df_para_dashboard, caminho_saida)
     print(f"\n--- Processo Concluído! ---")
     print(f"Arquivo final salvo em: {caminho_saida}")
-else:
-    print("\nAVISO: Não foram encontrados pacientes que atendam a todos os critérios. O arquivo final não será gerado.")
+    if caminho_saida_colunar:
+        print(f"Cópia colunar salva em: {caminho_saida_colunar}")
+    if caminho_saida_cubo:
+        print(f"Cubo de agregados salvo em: {caminho_saida_cubo}")
+    print(f"Manifesto salvo em: {caminho_saida_manifesto}")
+
+# --- Estado da ingestão incremental ---
+# primeira_dialise.parquet: registro da primeira diálise de cada chave.
+# fav.parquet: por chave, as únicas datas de FAV que ainda podem vir a ser a
+# primeira após a diálise: a mais antiga com espera positiva e as que não são
+# posteriores à primeira diálise (passam a contar se chegar uma diálise mais antiga).
+PASTA_ESTADO = './estado_incremental'
+
+def reduzir_fav_para_estado(df_primeira_dialise, df_fav_chave):
+    df_fav = df_fav_chave.drop_duplicates().merge(
+        df_primeira_dialise[CHAVES_PACIENTE + ['DATA_INICIO_DIALISE']], on=CHAVES_PACIENTE, how='left'
+    )
+    positiva = (df_fav['DATA_FAV'] - df_fav['DATA_INICIO_DIALISE']).dt.days > 0
+    primeiras = df_fav[positiva].sort_values('DATA_FAV', kind='stable').drop_duplicates(CHAVES_PACIENTE)
+    return pd.concat([df_fav[~positiva], primeiras])[CHAVES_PACIENTE + ['DATA_FAV']]
+
+def gravar_estado(pasta_estado, df_primeira_dialise, df_fav_estado):
+    os.makedirs(pasta_estado, exist_ok=True)
+    df_primeira_dialise.to_parquet(os.path.join(pasta_estado, 'primeira_dialise.parquet'), index=False)
+    df_fav_estado.to_parquet(os.path.join(pasta_estado, 'fav.parquet'), index=False)
+
+def ler_estado(pasta_estado):
+    caminho_dialise = os.path.join(pasta_estado, 'primeira_dialise.parquet')
+    caminho_fav = os.path.join(pasta_estado, 'fav.parquet')
+    if not (os.path.exists(caminho_dialise) and os.path.exists(caminho_fav)):
+        raise FileNotFoundError(
+            f"Estado incremental não encontrado em {pasta_estado}. "
+            "Execute o processamento completo antes de usar --incremental."
+        )
+    return pd.read_parquet(caminho_dialise), pd.read_parquet(caminho_fav)
+
+def ler_base_existente(caminho_saida):
+    if not os.path.exists(caminho_saida):
+        return pd.DataFrame(columns=list(COLUNAS_FINAIS.values()))
+    df_base = pd.read_csv(
+        caminho_saida,
+        parse_dates=['DATA_INICIO_DIALISE', 'DATA_CRIACAO_FAV'],
+        dtype={'ID_PACIENTE_COMPOSTO': str, 'MUN_RESIDENCIA_COD': str, 'COD_UNIDADE_HOSPITALAR': str}
+    )
+    # Bases gravadas antes das colunas de nome do município e da unidade
+    if 'MUN_RESIDENCIA_NOME' not in df_base.columns:
+        df_base['MUN_RESIDENCIA_NOME'] = nomes_municipios(df_base['MUN_RESIDENCIA_COD'])
+    if 'NOME_HOSPITAL' not in df_base.columns:
+        df_base['NOME_HOSPITAL'] = nomes_hospitais(df_base['COD_UNIDADE_HOSPITALAR'])
+    return df_base
+
+def caminho_relatorio(caminho_saida):
+    return os.path.splitext(caminho_saida)[0] + '_relatorio.json'
+
+def novo_relatorio(modo, arquivo_dialise, arquivo_fav, processos):
+    return RelatorioExecucao(
+        modo=modo, arquivo_dialise=arquivo_dialise, arquivo_fav=arquivo_fav, processos=processos,
+        python=platform.python_version(), pandas=pd.__version__
+    )
+
+def finalizar_relatorio(relatorio, caminho_json):
+    print(f"Relatório de execução salvo em: {relatorio.gravar(caminho_json)}")
+
+# Etapas comuns aos modos de processamento; cada uma registra no relatório o
+# tempo, a memória e as linhas descartadas pelos seus filtros
+
+def etapa_leitura(relatorio, arquivo_dialise, arquivo_fav, codigos_municipio, processos):
+    with relatorio.etapa('leitura') as registro:
+        df_dialise, df_fav = ler_apacs(
+            [(arquivo_dialise, COLUNAS_APAC['dialise']), (arquivo_fav, COLUNAS_APAC['fav'])],
+            codigos_municipio, processos=processos
+        )
+        registrar_descarte(registro, 'dialise_fora_dos_municipios', df_dialise.attrs['linhas_lidas'], len(df_dialise))
+        registrar_descarte(registro, 'fav_fora_dos_municipios', df_fav.attrs['linhas_lidas'], len(df_fav))
+    return df_dialise, df_fav
+
+def etapa_preparacao(relatorio, df_dialise, df_fav, bases_anteriores=()):
+    with relatorio.etapa('preparacao') as registro:
+        verificar_colisoes_chave(*bases_anteriores, df_dialise, df_fav)
+        linhas_dialise, linhas_fav = len(df_dialise), len(df_fav)
+        df_dialise_chave = preparar_dialise(df_dialise)
+        df_fav_chave = preparar_fav(df_fav)
+        registrar_descarte(registro, 'dialise_sem_data_ou_chave', linhas_dialise, len(df_dialise_chave))
+        registrar_descarte(registro, 'fav_sem_data_ou_chave', linhas_fav, len(df_fav_chave))
+    return df_dialise_chave, df_fav_chave
+
+def etapa_primeira_dialise(relatorio, df_dialise_chave):
+    with relatorio.etapa('primeira_dialise') as registro:
+        df_primeira_dialise = selecionar_primeira_dialise(df_dialise_chave)
+        registrar_descarte(registro, 'dialises_posteriores_do_paciente', len(df_dialise_chave), len(df_primeira_dialise))
+    return df_primeira_dialise
+
+def etapa_primeira_fav(relatorio, df_primeira_dialise, df_fav_chave):
+    with relatorio.etapa('primeira_fav') as registro:
+        df_primeira_fav = selecionar_primeira_fav(df_primeira_dialise, df_fav_chave)
+        # Pacientes sem FAV com TEMPO_ESPERA_DIAS > 0
+        registrar_descarte(registro, 'sem_fav_apos_inicio_dialise', len(df_primeira_dialise), len(df_primeira_fav))
+    return df_primeira_fav
+
+def etapa_base_dashboard(relatorio, df_primeira_fav):
+    with relatorio.etapa('base_dashboard') as registro:
+        df_para_dashboard = montar_base_dashboard(df_primeira_fav)
+        registrar_descarte(registro, 'fav_fora_de_2015_2024', len(df_primeira_fav), len(df_para_dashboard))
+    return df_para_dashboard
+
+def etapa_gravacao(relatorio, df_para_dashboard, caminho_saida):
+    with relatorio.etapa('gravacao') as registro:
+        registro['linhas_entrada'] = registro['linhas_saida'] = len(df_para_dashboard)
+        gravar_saidas(df_para_dashboard, caminho_saida)
+
+def processar_completo(arquivo_dialise, arquivo_fav, caminho_saida, pasta_estado, processos=1):
+    relatorio = novo_relatorio('completo', arquivo_dialise, arquivo_fav, processos)
+
+    print("--- Iniciando a Etapa 1: Carregamento dos Dados ---")
+    df_dialise_poa, df_fav_poa = etapa_leitura(relatorio, arquivo_dialise, arquivo_fav, [CODIGO_MUNICIPIO], processos)
+    print("✔️ Arquivos carregados e limpos com sucesso!")
+
+    df_dialise_chave, df_fav_chave = etapa_preparacao(relatorio, df_dialise_poa, df_fav_poa)
+    df_primeira_dialise = etapa_primeira_dialise(relatorio, df_dialise_chave)
+    df_primeira_fav = etapa_primeira_fav(relatorio, df_primeira_dialise, df_fav_chave)
+    etapa_gravacao(relatorio, etapa_base_dashboard(relatorio, df_primeira_fav), caminho_saida)
+
+    with relatorio.etapa('estado'):
+        gravar_estado(pasta_estado, df_primeira_dialise, reduzir_fav_para_estado(df_primeira_dialise, df_fav_chave))
+    finalizar_relatorio(relatorio, caminho_relatorio(caminho_saida))
+
+def processar_incremental(arquivo_dialise, arquivo_fav, caminho_saida, pasta_estado, processos=1):
+    # Ingere os arquivos de um novo mês: só as chaves presentes neles são
+    # recalculadas, e suas linhas são substituídas na base do dashboard
+    relatorio = novo_relatorio('incremental', arquivo_dialise, arquivo_fav, processos)
+    with relatorio.etapa('leitura_estado') as registro:
+        estado_dialise, estado_fav = ler_estado(pasta_estado)
+        registro['linhas_saida'] = len(estado_dialise) + len(estado_fav)
+
+    print("--- Iniciando a Etapa 1: Carregamento dos Dados (incremental) ---")
+    df_dialise_mes, df_fav_mes = etapa_leitura(relatorio, arquivo_dialise, arquivo_fav, [CODIGO_MUNICIPIO], processos)
+    print("✔️ Arquivos carregados e limpos com sucesso!")
+
+    novas_dialises, novas_favs = etapa_preparacao(relatorio, df_dialise_mes, df_fav_mes, [estado_dialise])
+
+    chaves_afetadas = pd.Index(novas_dialises['CHAVE_COMPOSTA']).union(pd.Index(novas_favs['CHAVE_COMPOSTA']))
+    dialise_afetada = estado_dialise['CHAVE_COMPOSTA'].isin(chaves_afetadas)
+    fav_afetada = estado_fav['CHAVE_COMPOSTA'].isin(chaves_afetadas)
+
+    # Em caso de empate na data prevalece o registro do estado, que veio antes no histórico
+    df_primeira_dialise = etapa_primeira_dialise(relatorio, pd.concat(
+        [estado_dialise[dialise_afetada], novas_dialises[estado_dialise.columns]], ignore_index=True
+    ))
+    df_fav_chave = pd.concat([estado_fav[fav_afetada], novas_favs], ignore_index=True)
+
+    df_novas_linhas = etapa_base_dashboard(relatorio, etapa_primeira_fav(relatorio, df_primeira_dialise, df_fav_chave))
+
+    with relatorio.etapa('atualizacao_base') as registro:
+        df_base = ler_base_existente(caminho_saida)
+        linhas_base = len(df_base)
+        # Pacientes já presentes na base têm registro de diálise no estado ou no novo mês
+        ids_afetados = montar_id_paciente(pd.concat([estado_dialise[dialise_afetada], novas_dialises]))
+        df_base = df_base[~df_base['ID_PACIENTE_COMPOSTO'].isin(ids_afetados)]
+        registrar_descarte(registro, 'substituidas_pelo_novo_mes', linhas_base, len(df_base))
+        df_para_dashboard = (
+            pd.concat([df_base, df_novas_linhas], ignore_index=True)
+            .sort_values('ID_PACIENTE_COMPOSTO', kind='stable')
+        )
+        registro['linhas_entrada'] += len(df_novas_linhas)
+        registro['linhas_saida'] = len(df_para_dashboard)
+    print(f"Chaves recalculadas: {len(chaves_afetadas)}")
+    etapa_gravacao(relatorio, df_para_dashboard, caminho_saida)
+
+    with relatorio.etapa('estado'):
+        gravar_estado(
+            pasta_estado,
+            pd.concat([estado_dialise[~dialise_afetada], df_primeira_dialise], ignore_index=True),
+            pd.concat([estado_fav[~fav_afetada], reduzir_fav_para_estado(df_primeira_dialise, df_fav_chave)], ignore_index=True)
+        )
+    finalizar_relatorio(relatorio, caminho_relatorio(caminho_saida))
+
+# Processamento estadual: uma única leitura dos arquivos para todos os
+# municípios do RS, com saída particionada no estilo Hive
+# (<pasta>/COD_MUNICIPIO=<código>/dados_finais_para_dashboard.csv)
+PASTA_PARTICOES = './dados_municipios'
+
+def caminho_particao(pasta_particoes, codigo_municipio):
+    return os.path.join(pasta_particoes, f'COD_MUNICIPIO={codigo_municipio}', 'dados_finais_para_dashboard.csv')
+
+def processar_estadual(arquivo_dialise, arquivo_fav, pasta_particoes, arquivo_municipios=ARQUIVO_MUNICIPIOS, processos=1):
+    relatorio = novo_relatorio('estadual', arquivo_dialise, arquivo_fav, processos)
+    # AP_UFMUN usa os 6 primeiros dígitos do código IBGE
+    municipios = dimensao_municipios(arquivo_municipios)
+    codigos = municipios['codigos']
+
+    print(f"--- Iniciando a Etapa 1: Carregamento dos Dados ({len(codigos)} municípios) ---")
+    df_dialise_rs, df_fav_rs = etapa_leitura(relatorio, arquivo_dialise, arquivo_fav, codigos, processos)
+    print("✔️ Arquivos carregados e limpos com sucesso!")
+
+    df_dialise_chave, df_fav_chave = etapa_preparacao(relatorio, df_dialise_rs, df_fav_rs)
+
+    # As etapas de primeiro evento já agrupam por município (CHAVES_PACIENTE)
+    df_primeira_dialise = etapa_primeira_dialise(relatorio, df_dialise_chave)
+    df_primeira_fav = etapa_primeira_fav(relatorio, df_primeira_dialise, df_fav_chave)
+
+    with relatorio.etapa('base_dashboard') as registro:
+        bases_municipios = {}
+        for codigo_municipio, df_municipio in df_primeira_fav.groupby('COD_MUNICIPIO'):
+            df_para_dashboard = montar_base_dashboard(df_municipio, municipios)
+            registrar_descarte(registro, 'fav_fora_de_2015_2024', len(df_municipio), len(df_para_dashboard))
+            if not df_para_dashboard.empty:
+                bases_municipios[codigo_municipio] = df_para_dashboard
+
+    with relatorio.etapa('gravacao') as registro:
+        registro['linhas_entrada'] = registro['linhas_saida'] = sum(len(df) for df in bases_municipios.values())
+        for codigo_municipio, df_para_dashboard in bases_municipios.items():
+            caminho_saida = caminho_particao(pasta_particoes, codigo_municipio)
+            os.makedirs(os.path.dirname(caminho_saida), exist_ok=True)
+            gravar_saidas(df_para_dashboard, caminho_saida)
+        registro['particoes'] = len(bases_municipios)
+
+    os.makedirs(pasta_particoes, exist_ok=True)
+    finalizar_relatorio(relatorio, os.path.join(pasta_particoes, 'relatorio_execucao.json'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera a base do dashboard a partir dos arquivos APAC (ATDRS/ACFRS).")
+    parser.add_argument('--dialise', default='./ATDRS.csv', help="Arquivo APAC de diálise (ATDRS)")
+    parser.add_argument('--fav', default='./ACFRS.csv', help="Arquivo APAC de confecção de FAV (ACFRS)")
+    parser.add_argument('--saida', default='./dados_finais_para_dashboard.csv', help="CSV de saída do dashboard")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument('--incremental', action='store_true',
+                      help="Ingere apenas os arquivos de um novo mês, atualizando o estado salvo")
+    modo.add_argument('--estadual', action='store_true',
+                      help="Processa todos os municípios do RS, com saída particionada por município")
+    parser.add_argument('--estado', default=PASTA_ESTADO, help="Pasta do estado da ingestão incremental")
+    parser.add_argument('--particoes', default=PASTA_PARTICOES, help="Pasta da saída particionada do modo estadual")
+    parser.add_argument('--municipios', default=ARQUIVO_MUNICIPIOS, help="Arquivo com os códigos IBGE dos municípios do RS")
+    parser.add_argument('--processos', type=int, default=1,
+                        help="Processos usados na leitura dos arquivos APAC (1 = leitura sequencial)")
+    args = parser.parse_args()
+
+    if args.estadual:
+        processar_estadual(args.dialise, args.fav, args.particoes, args.municipios, args.processos)
+    elif args.incremental:
+        processar_incremental(args.dialise, args.fav, args.saida, args.estado, args.processos)
+    else:
+        processar_completo(args.dialise, args.fav, args.saida, args.estado, args.processos)
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 import streamlit as st
 import altair as alt
-from filtro import load_and_filter_data
+from filtros_globais import barra_lateral_filtros, dados_filtrados, cubo_filtrado
+from agregados import resumir_cubo
+from perfil import iniciar_perfil, medir
+from graficos import boxplot_altair
 
 # --- Configuração da página ---
 st.set_page_config(
@@ -8,126 +11,86 @@ st.set_page_config(
     page_icon="🩺",
     layout="wide"
 )
+iniciar_perfil("dashboard")
 
 st.title("⏱️ Tempo de Espera para Confecção de FAV")
 st.markdown("### Pacientes em Diálise Crônica | Porto Alegre (2015–2024)")
 
-# --- Filtros na barra lateral ---
-st.sidebar.header("Filtros Globais")
-
-# Carregamento inicial dos dados e opções
-df_base, opcoes_acesso, anos_disponiveis, meses_disponiveis = load_and_filter_data(
-    filtro_acesso_default=False,
-    filtro_cronico_default=False
-)
-
-if df_base is None or df_base.empty:
-    st.warning("⚠️ Dados não disponíveis.")
-    st.stop()
-
-# Tipo de acesso
-filtros_acesso = st.sidebar.multiselect(
-    "Tipo de Acesso Vascular Inicial",
-    options=opcoes_acesso,
-    default=[ac for ac in opcoes_acesso if "Fístula" in ac]
-)
-
-# Pacientes crônicos
-filtro_cronico = st.sidebar.checkbox(
-    "Somente pacientes crônicos (≥ 3 meses de tratamento)",
-    value=True
-)
-
-# Intervalo de anos
-ano_min = min(anos_disponiveis) if anos_disponiveis else 2015
-ano_max = max(anos_disponiveis) if anos_disponiveis else 2024
-ano_inicial, ano_final = st.sidebar.slider(
-    "Intervalo de Anos (Criação da FAV)",
-    min_value=ano_min,
-    max_value=ano_max,
-    value=(ano_min, ano_max),
-    step=1
-)
-
-# Meses
-meses_selecionados = st.sidebar.multiselect(
-    "Meses (Criação da FAV)",
-    options=meses_disponiveis,
-    format_func=lambda x: f"{x:02d}",
-    default=meses_disponiveis
-)
-
-# --- Aplicar filtros e carregar dados filtrados ---
-df_filtrado, _, _, _ = load_and_filter_data(
-    filtro_acesso_default=False,
-    filtro_cronico_default=filtro_cronico,
-    filtros_acesso=filtros_acesso,
-    anos_selecionados=list(range(ano_inicial, ano_final + 1)),
-    meses_selecionados=meses_selecionados
-)
+# --- Filtros globais (compartilhados entre as páginas) ---
+filtros = barra_lateral_filtros()
+df_filtrado = dados_filtrados(filtros)
 
 if df_filtrado.empty:
     st.warning("⚠️ Nenhum paciente encontrado com os filtros aplicados.")
     st.stop()
 
+# Cubo de agregados com os mesmos filtros, usado nos indicadores
+with medir("Indicadores (cubo)"):
+    cubo = cubo_filtrado(filtros)
+    resumo = resumir_cubo(cubo).iloc[0]
+
 # --- Indicadores principais ---
 col1, col2, col3 = st.columns(3)
-col1.metric("Tempo Médio de Espera", f"{df_filtrado['TEMPO_ESPERA_DIAS'].mean():.0f} dias")
-col2.metric("Número de Pacientes", f"{len(df_filtrado)}")
-col3.metric("Unidades Hospitalares", f"{df_filtrado['COD_UNIDADE_HOSPITALAR'].nunique()}")
+col1.metric("Tempo Médio de Espera", f"{resumo['Media']:.0f} dias")
+col2.metric("Número de Pacientes", f"{int(resumo['N'])}")
+col3.metric("Unidades Hospitalares", f"{cubo.loc[cubo['N'] > 0, 'COD_UNIDADE_HOSPITALAR'].nunique()}")
 
 # --- Evolução temporal ---
 with st.expander("📈 Evolução Anual do Tempo de Espera"):
-    media_anual = df_filtrado.groupby("ANO_FAV")["TEMPO_ESPERA_DIAS"].mean().reset_index()
-    media_anual.columns = ["Ano", "Tempo Médio (dias)"]
-
-    chart_linha = alt.Chart(media_anual).mark_line(point=True).encode(
-        x=alt.X("Ano:O", axis=alt.Axis(title="Ano")),
-        y=alt.Y("Tempo Médio (dias):Q", axis=alt.Axis(title="Tempo Médio (dias)", format=".0f")),
-        tooltip=["Ano", "Tempo Médio (dias)"]
-    ).properties(
-        title="Tempo Médio Anual para Confecção da FAV",
-        width=700,
-        height=350
-    )
-    st.altair_chart(chart_linha, use_container_width=True)
-
-    chart_boxplot = alt.Chart(df_filtrado).mark_boxplot(extent='min-max').encode(
-        x=alt.X("ANO_FAV:O", title="Ano"),
-        y=alt.Y("TEMPO_ESPERA_DIAS:Q", title="Tempo de Espera (dias)"),
-        tooltip=["ANO_FAV", "TEMPO_ESPERA_DIAS"]
-    ).properties(
-        title="Distribuição Anual do Tempo de Espera",
-        width=700,
-        height=350
-    )
-    st.altair_chart(chart_boxplot, use_container_width=True)
+    with medir("Média anual (cubo)"):
+        media_anual = resumir_cubo(cubo, por=["ANO_FAV"])[["ANO_FAV", "Media"]]
+        media_anual.columns = ["Ano", "Tempo Médio (dias)"]
+
+    with medir("Evolução anual: figura"):
+        chart_linha = alt.Chart(media_anual).mark_line(point=True).encode(
+            x=alt.X("Ano:O", axis=alt.Axis(title="Ano")),
+            y=alt.Y("Tempo Médio (dias):Q", axis=alt.Axis(title="Tempo Médio (dias)", format=".0f")),
+            tooltip=["Ano", "Tempo Médio (dias)"]
+        ).properties(
+            title="Tempo Médio Anual para Confecção da FAV",
+            width=700,
+            height=350
+        )
+    with medir("Evolução anual: st.altair_chart"):
+        st.altair_chart(chart_linha, use_container_width=True)
+
+    with medir("Boxplot anual: figura"):
+        chart_boxplot = boxplot_altair(
+            df_filtrado,
+            x="ANO_FAV",
+            y="TEMPO_ESPERA_DIAS",
+            titulo_x="Ano",
+            titulo_y="Tempo de Espera (dias)",
+            title="Distribuição Anual do Tempo de Espera"
+        )
+    with medir("Boxplot anual: st.altair_chart"):
+        st.altair_chart(chart_boxplot, use_container_width=True)
 
 # --- Distribuições por características dos pacientes ---
 with st.expander("📊 Distribuição dos Pacientes por Características"):
     col1, col2, col3 = st.columns(3)
 
-    with col1:
+    with col1, medir("Distribuição por sexo"):
         st.write("**Distribuição por Sexo**")
         st.bar_chart(df_filtrado['SEXO'].value_counts())
 
-    with col2:
+    with col2, medir("Distribuição por faixa etária"):
         st.write("**Distribuição por Faixa Etária**")
         st.bar_chart(df_filtrado['FAIXA_ETARIA'].value_counts().sort_index())
 
-    with col3:
+    with col3, medir("Distribuição por raça/cor"):
         st.write("**Distribuição por Raça/Cor**")
         st.bar_chart(df_filtrado['RACA_COR'].value_counts())
 
 # --- Tempo médio por tipo de acesso ---
 with st.expander("📋 Tempo Médio por Tipo de Acesso Vascular"):
-    media_por_acesso = (
-        df_filtrado
-        .groupby("ACESSO_VASCULAR_INICIAL")["TEMPO_ESPERA_DIAS"]
-        .agg(['mean', 'count'])
-        .round(0)
-        .rename(columns={'mean': 'Tempo Médio (dias)', 'count': 'Número de Pacientes'})
-    )
+    with medir("Tempo médio por acesso (cubo)"):
+        media_por_acesso = (
+            resumir_cubo(cubo, por=["ACESSO_VASCULAR_INICIAL"])
+            .set_index("ACESSO_VASCULAR_INICIAL")[['Media', 'N']]
+            .round(0)
+            .rename(columns={'Media': 'Tempo Médio (dias)', 'N': 'Número de Pacientes'})
+        )
     st.dataframe(media_por_acesso)
 
 # --- Amostra de dados ---
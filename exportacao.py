@@ -0,0 +1,79 @@
+import gzip
+import tempfile
+from functools import partial
+
+import streamlit as st
+
+# Exportação dos dados filtrados sob demanda: o arquivo só é gerado quando o
+# usuário clica no botão de download (data= recebe uma função), escrito em
+# blocos de linhas num arquivo temporário que passa da memória para o disco
+# acima de LIMITE_MEMORIA_BYTES. Assim cada execução da página não serializa a
+# base inteira, e a exportação não mantém o texto do CSV e a cópia em bytes ao
+# mesmo tempo.
+
+TAMANHO_BLOCO_LINHAS = 100_000
+LIMITE_MEMORIA_BYTES = 32 << 20
+
+# Rótulo: (extensão, tipo MIME)
+FORMATOS_EXPORTACAO = {
+    "CSV": (".csv", "text/csv"),
+    "CSV compactado (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+def formatos_disponiveis():
+    # Parquet depende do pyarrow, opcional como em dados.py
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return [formato for formato in FORMATOS_EXPORTACAO if formato != "Parquet"]
+    return list(FORMATOS_EXPORTACAO)
+
+def blocos(df):
+    # Ao menos um bloco, para que uma seleção vazia ainda gere o cabeçalho
+    for inicio in range(0, max(len(df), 1), TAMANHO_BLOCO_LINHAS):
+        yield inicio, df.iloc[inicio:inicio + TAMANHO_BLOCO_LINHAS]
+
+def escrever_csv(df, destino):
+    for inicio, bloco in blocos(df):
+        destino.write(bloco.to_csv(index=False, header=inicio == 0).encode('utf-8'))
+
+def escrever_parquet(df, destino):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Esquema do DataFrame inteiro, para que blocos com colunas só de ausentes
+    # não mudem o tipo de uma coluna entre grupos de linhas
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for _, bloco in blocos(df):
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+
+def exportar(df, formato):
+    with tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_BYTES) as arquivo:
+        if formato == "Parquet":
+            escrever_parquet(df, arquivo)
+        elif formato == "CSV compactado (gzip)":
+            with gzip.GzipFile(fileobj=arquivo, mode='wb') as compactado:
+                escrever_csv(df, compactado)
+        else:
+            escrever_csv(df, arquivo)
+        # O Streamlit guarda o download em bytes; esta é a única cópia completa
+        arquivo.seek(0)
+        return arquivo.read()
+
+def botao_exportacao(df, nome_arquivo):
+    # Seletor de formato e botão de download; nome_arquivo sem extensão
+    formato = st.radio(
+        "Formato",
+        formatos_disponiveis(),
+        horizontal=True
+    )
+    extensao, mime = FORMATOS_EXPORTACAO[formato]
+    st.download_button(
+        label=f"📄 Baixar {formato}",
+        data=partial(exportar, df, formato),
+        file_name=nome_arquivo + extensao,
+        mime=mime,
+        on_click="ignore"
+    )
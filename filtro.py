@@ -1,9 +1,259 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-@st.cache_data(hash_funcs={"_io.BufferedReader": hash})
+from agregados import construir_cubo, filtrar_cubo
+from manifesto import caminho_manifesto, ler_manifesto
+from hospitais import nomes_hospitais
+from categorias import aplicar_categorias, categorias_presentes
+
+# Com MUNICIPIO_DASHBOARD definido, o dashboard lê apenas a partição do
+# município gerada pelo modo estadual de dados.py
+# (<PASTA_PARTICOES>/COD_MUNICIPIO=<código>/dados_finais_para_dashboard.csv)
+PASTA_PARTICOES = os.environ.get("PASTA_PARTICOES", "dados_municipios")
+
+def caminho_dados_municipio(codigo_municipio, pasta_particoes=PASTA_PARTICOES):
+    return os.path.join(pasta_particoes, f"COD_MUNICIPIO={codigo_municipio}", "dados_finais_para_dashboard.csv")
+
+CAMINHO_DADOS = (
+    caminho_dados_municipio(os.environ["MUNICIPIO_DASHBOARD"])
+    if os.environ.get("MUNICIPIO_DASHBOARD")
+    else "dados_finais_para_dashboard.csv"
+)
+
+def caminho_base_colunar(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + ".parquet"
+
+def caminho_cubo(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + "_cubo.parquet"
+
+def derivado_atualizado(caminho_derivado, caminho_csv):
+    # Arquivos gerados por dados.py só são usados se não forem mais antigos que o CSV
+    return os.path.exists(caminho_derivado) and (
+        not os.path.exists(caminho_csv)
+        or os.path.getmtime(caminho_derivado) >= os.path.getmtime(caminho_csv)
+    )
+
+def completar_tipos(df):
+    # Categorias fixas de categorias.py e a coluna NOME_HOSPITAL, que o cubo não
+    # guarda (é derivada do CNES)
+    if 'NOME_HOSPITAL' not in df.columns:
+        df['NOME_HOSPITAL'] = nomes_hospitais(df['COD_UNIDADE_HOSPITALAR'])
+    return aplicar_categorias(df)
+
+def ler_base_dashboard(caminho_csv):
+    # Prefere a cópia Parquet gerada por dados.py (tipos nativos e ANO_FAV/MES_FAV
+    # já derivados)
+    caminho_parquet = caminho_base_colunar(caminho_csv)
+    if derivado_atualizado(caminho_parquet, caminho_csv):
+        try:
+            return completar_tipos(pd.read_parquet(caminho_parquet))
+        except ImportError:
+            pass
+
+    df = pd.read_csv(
+        caminho_csv,
+        parse_dates=["DATA_INICIO_DIALISE", "DATA_CRIACAO_FAV"]
+    )
+
+    # Colunas auxiliares
+    df['ANO_FAV'] = df['DATA_CRIACAO_FAV'].dt.year
+    df['MES_FAV'] = df['DATA_CRIACAO_FAV'].dt.month
+    return completar_tipos(df)
+
+@st.cache_resource(max_entries=4)
+def carregar_manifesto(caminho_csv, data_manifesto, data_base):
+    # Relido quando o manifesto ou a base mudam (um CSV regravado sem novo
+    # manifesto o torna inválido); o dicionário retornado não deve ser alterado
+    return ler_manifesto(caminho_csv)
+
+def manifesto_base(caminho_csv):
+    caminho = caminho_manifesto(caminho_csv)
+    if not os.path.exists(caminho):
+        return None
+    datas_base = [
+        os.path.getmtime(arquivo)
+        for arquivo in (caminho_csv, caminho_base_colunar(caminho_csv))
+        if os.path.exists(arquivo)
+    ]
+    return carregar_manifesto(caminho_csv, os.path.getmtime(caminho), max(datas_base, default=None))
+
+def assinatura_base(caminho_csv):
+    # Hash do conteúdo registrado no manifesto; sem manifesto válido, a data de
+    # modificação mais recente entre o CSV e os arquivos derivados. Muda sempre
+    # que dados.py regrava a base, invalidando os caches de carregamento
+    manifesto = manifesto_base(caminho_csv)
+    if manifesto is not None:
+        return manifesto['hash_conteudo']
+    datas = [
+        os.path.getmtime(caminho)
+        for caminho in (caminho_csv, caminho_base_colunar(caminho_csv), caminho_cubo(caminho_csv))
+        if os.path.exists(caminho)
+    ]
+    if not datas:
+        raise FileNotFoundError(caminho_csv)
+    return max(datas)
+
+def mascaras_por_valor(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Comparação dos códigos inteiros, na ordem das categorias
+        codigos = serie.cat.codes.to_numpy()
+        return {
+            categoria: codigos == serie.cat.categories.get_loc(categoria)
+            for categoria in categorias_presentes(serie)
+        }
+    valores = serie.to_numpy()
+    return {valor: valores == valor for valor in serie.dropna().unique().tolist()}
+
+def construir_indice_filtros(df):
+    # Máscaras booleanas pré-calculadas para cada valor dos filtros globais; um
+    # pedido de filtro vira apenas algumas operações OR/AND entre arrays
+    return {
+        'acesso': mascaras_por_valor(df['ACESSO_VASCULAR_INICIAL']),
+        'ano': mascaras_por_valor(df['ANO_FAV']),
+        'mes': mascaras_por_valor(df['MES_FAV']),
+        'cronico': (df['CRONICO_3_MESES'] == True).to_numpy(),
+        'espera_valida': (
+            (df['TEMPO_ESPERA_DIAS'] >= 0) & (df['TEMPO_ESPERA_DIAS'] <= 730)
+        ).to_numpy(),
+        'valores_ano': pd.to_numeric(df['ANO_FAV'], errors='coerce').to_numpy(dtype=float),
+    }
+
+@st.cache_resource(max_entries=1)
+def carregar_base(caminho_csv, assinatura):
+    # Carregada uma única vez por processo e compartilhada entre as sessões,
+    # junto com o índice de filtros: o DataFrame retornado não deve ser alterado
+    df = ler_base_dashboard(caminho_csv)
+    return df, construir_indice_filtros(df)
+
+@st.cache_resource(max_entries=1)
+def carregar_cubo(caminho_csv, assinatura):
+    # Usa o cubo gravado por dados.py junto com um manifesto válido (da versão
+    # atual do esquema); na falta de um dos dois, monta o cubo a partir da base
+    caminho = caminho_cubo(caminho_csv)
+    if derivado_atualizado(caminho, caminho_csv) and manifesto_base(caminho_csv) is not None:
+        try:
+            return completar_tipos(pd.read_parquet(caminho))
+        except ImportError:
+            pass
+    df, _ = carregar_base(caminho_csv, assinatura)
+    return completar_tipos(construir_cubo(df))
+
+@st.cache_resource(max_entries=1)
+def calcular_opcoes_filtros(caminho_csv, assinatura):
+    # Sem manifesto, as opções saem do índice de filtros (exige carregar a base)
+    _, indice = carregar_base(caminho_csv, assinatura)
+    anos = indice['valores_ano'][~np.isnan(indice['valores_ano'])]
+    return list(indice['acesso']), sorted(set(anos.astype(int).tolist()))
+
+def opcoes_filtros(caminho_csv=CAMINHO_DADOS):
+    # (opcoes_acesso, anos_disponiveis, meses_disponiveis) da base inteira, lidas
+    # do manifesto gravado por dados.py sempre que ele estiver atualizado
+    manifesto = manifesto_base(caminho_csv)
+    if manifesto is not None:
+        opcoes_acesso = manifesto['valores_distintos']['ACESSO_VASCULAR_INICIAL']
+        anos = manifesto['valores_distintos']['ANO_FAV']
+    else:
+        try:
+            opcoes_acesso, anos = calcular_opcoes_filtros(caminho_csv, assinatura_base(caminho_csv))
+        except FileNotFoundError:
+            return [], [], []
+    anos_disponiveis = list(range(min(anos), max(anos) + 1)) if anos else []
+    return list(opcoes_acesso), anos_disponiveis, list(range(1, 13))
+
+def carregar_cubo_filtrado(
+    filtros_acesso,
+    filtro_cronico,
+    anos_selecionados,
+    meses_selecionados,
+    caminho_csv=CAMINHO_DADOS
+):
+    # Células do cubo que atendem aos filtros globais; use agregados.resumir_cubo
+    # para obter os indicadores sem percorrer os pacientes
+    try:
+        cubo = carregar_cubo(caminho_csv, assinatura_base(caminho_csv))
+    except FileNotFoundError:
+        return pd.DataFrame()
+    return filtrar_cubo(cubo, filtros_acesso, filtro_cronico, anos_selecionados, meses_selecionados)
+
+# Limites do cache de resultados filtrados (configuráveis por variável de ambiente)
+CACHE_FILTROS_MAX_ENTRADAS = int(os.environ.get("CACHE_FILTROS_MAX_ENTRADAS", 32))
+CACHE_FILTROS_TTL_SEGUNDOS = float(os.environ.get("CACHE_FILTROS_TTL_SEGUNDOS", 600))
+
+class CacheLRU:
+    # Cache LRU limitado em número de entradas e em tempo de vida, com
+    # contadores de acertos, falhas, remoções por capacidade e expirações
+    def __init__(self, max_entradas, ttl_segundos):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self.expiracoes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and time.monotonic() - entrada[0] > self.ttl_segundos:
+                del self._entradas[chave]
+                self.expiracoes += 1
+                entrada = None
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._entradas[chave] = (time.monotonic(), valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.remocoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "remocoes": self.remocoes,
+                "expiracoes": self.expiracoes,
+            }
+
+@st.cache_resource
+def cache_filtros():
+    return CacheLRU(CACHE_FILTROS_MAX_ENTRADAS, CACHE_FILTROS_TTL_SEGUNDOS)
+
+def estatisticas_cache_filtros():
+    return cache_filtros().estatisticas()
+
+def normalizar_selecao(selecionados):
+    # A ordem das opções escolhidas na barra lateral não altera o resultado
+    if selecionados is None:
+        return None
+    return tuple(sorted(set(selecionados), key=str))
+
+def mascara_selecao(mascaras, selecionados, tamanho):
+    mascara = np.zeros(tamanho, dtype=bool)
+    for valor in selecionados:
+        if valor in mascaras:
+            mascara |= mascaras[valor]
+    return mascara
+
 def load_and_filter_data(
-    caminho_csv="dados_finais_para_dashboard.csv",
+    caminho_csv=CAMINHO_DADOS,
     filtro_acesso_default=True,
     filtro_cronico_default=True,
     anos_selecionados=None,
@@ -11,19 +261,46 @@ def load_and_filter_data(
     filtros_acesso=None
 ):
     try:
-        df = pd.read_csv(
-            caminho_csv,
-            parse_dates=["DATA_INICIO_DIALISE", "DATA_CRIACAO_FAV"]
-        )
+        assinatura = assinatura_base(caminho_csv)
+        df, indice = carregar_base(caminho_csv, assinatura)
     except FileNotFoundError:
         return pd.DataFrame(), [], [], []
 
-    # Colunas auxiliares
-    df['ANO_FAV'] = df['DATA_CRIACAO_FAV'].dt.year
-    df['MES_FAV'] = df['DATA_CRIACAO_FAV'].dt.month
+    cache = cache_filtros()
+    chave = (
+        caminho_csv, assinatura, bool(filtro_acesso_default), bool(filtro_cronico_default),
+        normalizar_selecao(anos_selecionados), normalizar_selecao(meses_selecionados),
+        normalizar_selecao(filtros_acesso)
+    )
+    resultado = cache.obter(chave)
+    if resultado is None:
+        resultado = filtrar_base(
+            df, indice, filtro_acesso_default, filtro_cronico_default,
+            anos_selecionados, meses_selecionados, filtros_acesso
+        )
+        cache.guardar(chave, resultado)
+
+    # O resultado em cache é compartilhado entre sessões; cada chamada recebe
+    # uma cópia rasa, para que colunas criadas pelas páginas não o alterem
+    df_filtrado, opcoes_acesso, anos_disponiveis, meses_disponiveis = resultado
+    return df_filtrado.copy(deep=False), list(opcoes_acesso), list(anos_disponiveis), list(meses_disponiveis)
+
+def filtrar_base(
+    df,
+    indice,
+    filtro_acesso_default,
+    filtro_cronico_default,
+    anos_selecionados,
+    meses_selecionados,
+    filtros_acesso
+):
+    colunas_esperadas = [
+        "TEMPO_ESPERA_DIAS", "COD_UNIDADE_HOSPITALAR", "SEXO", "FAIXA_ETARIA",
+        "RACA_COR", "ACESSO_VASCULAR_INICIAL", "ANO_FAV", "MES_FAV"
+    ]
 
     # Opções de acesso disponíveis
-    opcoes_acesso = df['ACESSO_VASCULAR_INICIAL'].dropna().unique().tolist()
+    opcoes_acesso = list(indice['acesso'])
 
     # Define filtros padrão se não fornecidos
     if filtros_acesso is None:
@@ -34,52 +311,42 @@ def load_and_filter_data(
 
     # Caso filtro de acesso esteja vazio (sem seleção), retorna DataFrame vazio com colunas certas
     if not filtros_acesso:
-        colunas_esperadas = [
-            "TEMPO_ESPERA_DIAS", "COD_UNIDADE_HOSPITALAR", "SEXO", "FAIXA_ETARIA",
-            "RACA_COR", "ACESSO_VASCULAR_INICIAL", "ANO_FAV", "MES_FAV"
-        ]
-        df_vazio = pd.DataFrame(columns=colunas_esperadas)
-        return df_vazio, opcoes_acesso, [], []
+        return pd.DataFrame(columns=colunas_esperadas), opcoes_acesso, [], []
 
-    df_filtrado = df[df['ACESSO_VASCULAR_INICIAL'].isin(filtros_acesso)]
+    mascara = mascara_selecao(indice['acesso'], filtros_acesso, len(df))
 
     if filtro_cronico_default:
-        df_filtrado = df_filtrado[df_filtrado['CRONICO_3_MESES'] == True]
+        mascara &= indice['cronico']
 
     # Se vazio após filtro, retornar DataFrame vazio com colunas essenciais
-    if df_filtrado.empty:
-        colunas_esperadas = [
-            "TEMPO_ESPERA_DIAS", "COD_UNIDADE_HOSPITALAR", "SEXO", "FAIXA_ETARIA",
-            "RACA_COR", "ACESSO_VASCULAR_INICIAL", "ANO_FAV", "MES_FAV"
-        ]
-        df_vazio = pd.DataFrame(columns=colunas_esperadas)
-        return df_vazio, opcoes_acesso, [], []
+    if not mascara.any():
+        return pd.DataFrame(columns=colunas_esperadas), opcoes_acesso, [], []
 
     # Filtro por ano
-    ano_min = df_filtrado['ANO_FAV'].min()
-    ano_max = df_filtrado['ANO_FAV'].max()
+    anos_presentes = indice['valores_ano'][mascara]
+    anos_presentes = anos_presentes[~np.isnan(anos_presentes)]
 
-    if pd.isna(ano_min) or pd.isna(ano_max):
+    if anos_presentes.size == 0:
         anos_disponiveis = []
     else:
-        anos_disponiveis = list(range(int(ano_min), int(ano_max) + 1))
+        anos_disponiveis = list(range(int(anos_presentes.min()), int(anos_presentes.max()) + 1))
 
     if anos_selecionados is None:
         anos_selecionados = anos_disponiveis
 
-    df_filtrado = df_filtrado[df_filtrado['ANO_FAV'].isin(anos_selecionados)]
+    mascara &= mascara_selecao(indice['ano'], anos_selecionados, len(df))
 
     # Filtro por mês
     meses_disponiveis = list(range(1, 13))
     if meses_selecionados is None:
         meses_selecionados = meses_disponiveis
 
-    df_filtrado = df_filtrado[df_filtrado['MES_FAV'].isin(meses_selecionados)]
+    mascara &= mascara_selecao(indice['mes'], meses_selecionados, len(df))
 
     # Garante apenas tempos válidos de espera
-    df_filtrado = df_filtrado[
-        (df_filtrado['TEMPO_ESPERA_DIAS'] >= 0) &
-        (df_filtrado['TEMPO_ESPERA_DIAS'] <= 730)
-    ]
+    mascara &= indice['espera_valida']
+
+    # Única cópia do DataFrame: as linhas selecionadas pelas máscaras combinadas
+    df_filtrado = df.take(np.flatnonzero(mascara))
 
     return df_filtrado, opcoes_acesso, anos_disponiveis, meses_disponiveis
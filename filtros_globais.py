@@ -0,0 +1,143 @@
+import streamlit as st
+
+from filtro import opcoes_filtros, load_and_filter_data, carregar_cubo_filtrado
+from perfil import medir
+
+# Filtros globais (tipo de acesso, crônicos, anos e meses) compartilhados por
+# todas as páginas. A seleção fica em st.session_state[CHAVE_ESTADO] e é
+# restaurada nos widgets de cada página, de modo que trocar de página mantém os
+# filtros; as opções vêm do índice da base já carregada, sem filtrar os dados.
+# Enquanto o usuário não mexe no tipo de acesso, cada página pode usar o seu
+# próprio padrão para ele (a página de comparação entre acessos mostra todos).
+CHAVE_ESTADO = 'filtros_globais'
+
+def estado_inicial(opcoes_acesso, anos_disponiveis, meses_disponiveis):
+    return {
+        'acesso': [ac for ac in opcoes_acesso if "Fístula" in ac],
+        'acesso_alterado': False,
+        'cronico': True,
+        'anos': (min(anos_disponiveis), max(anos_disponiveis)),
+        'meses': list(meses_disponiveis),
+    }
+
+def ajustar_estado(estado, opcoes_acesso, anos_disponiveis, meses_disponiveis):
+    # Descarta valores que deixaram de existir (por exemplo, após regravar a base)
+    ano_min, ano_max = min(anos_disponiveis), max(anos_disponiveis)
+    ano_inicial, ano_final = estado['anos']
+    ano_inicial = min(max(ano_inicial, ano_min), ano_max)
+    ano_final = min(max(ano_final, ano_inicial), ano_max)
+    return {
+        'acesso': [ac for ac in estado['acesso'] if ac in opcoes_acesso],
+        'acesso_alterado': bool(estado.get('acesso_alterado')),
+        'cronico': bool(estado['cronico']),
+        'anos': (ano_inicial, ano_final),
+        'meses': [m for m in estado['meses'] if m in meses_disponiveis],
+    }
+
+def chave_widget(nome):
+    return f'_filtro_{nome}'
+
+def restaurar_widget(nome, valor):
+    # Ao trocar de página o Streamlit descarta o estado dos widgets; o valor
+    # salvo é recolocado na chave do widget antes de desenhá-lo
+    st.session_state[chave_widget(nome)] = valor
+    return chave_widget(nome)
+
+def salvar_widget(nome):
+    # Callback dos widgets: roda antes da página, então restaurar_widget já
+    # encontra o valor novo
+    st.session_state[CHAVE_ESTADO][nome] = st.session_state[chave_widget(nome)]
+    if nome == 'acesso':
+        st.session_state[CHAVE_ESTADO]['acesso_alterado'] = True
+
+def barra_lateral_filtros(todos_acessos_por_padrao=False):
+    # Desenha os filtros globais na barra lateral e devolve a seleção atual
+    with medir("Opções dos filtros"):
+        opcoes_acesso, anos_disponiveis, meses_disponiveis = opcoes_filtros()
+
+    if not opcoes_acesso or not anos_disponiveis:
+        st.warning("⚠️ Dados não disponíveis.")
+        st.stop()
+
+    estado = st.session_state.get(CHAVE_ESTADO) or estado_inicial(
+        opcoes_acesso, anos_disponiveis, meses_disponiveis
+    )
+    estado = ajustar_estado(estado, opcoes_acesso, anos_disponiveis, meses_disponiveis)
+    st.session_state[CHAVE_ESTADO] = estado
+    # Padrão da página, que não é gravado no estado compartilhado
+    padrao_da_pagina = todos_acessos_por_padrao and not estado['acesso_alterado']
+
+    st.sidebar.header("Filtros Globais")
+
+    filtros_acesso = st.sidebar.multiselect(
+        "Tipo de Acesso Vascular Inicial",
+        options=opcoes_acesso,
+        key=restaurar_widget('acesso', list(opcoes_acesso) if padrao_da_pagina else estado['acesso']),
+        on_change=salvar_widget,
+        args=('acesso',)
+    )
+
+    filtro_cronico = st.sidebar.checkbox(
+        "Apenas pacientes crônicos (≥ 3 meses de tratamento)",
+        key=restaurar_widget('cronico', estado['cronico']),
+        on_change=salvar_widget,
+        args=('cronico',)
+    )
+
+    ano_min, ano_max = min(anos_disponiveis), max(anos_disponiveis)
+    if ano_min < ano_max:
+        ano_inicial, ano_final = st.sidebar.slider(
+            "Intervalo de Anos da Criação da FAV",
+            min_value=ano_min,
+            max_value=ano_max,
+            step=1,
+            key=restaurar_widget('anos', estado['anos']),
+            on_change=salvar_widget,
+            args=('anos',)
+        )
+    else:
+        ano_inicial, ano_final = ano_min, ano_max
+        st.sidebar.caption(f"Ano da Criação da FAV: {ano_min}")
+
+    meses_selecionados = st.sidebar.multiselect(
+        "Meses da Criação da FAV",
+        options=meses_disponiveis,
+        format_func=lambda x: f"{x:02d}",
+        key=restaurar_widget('meses', estado['meses']),
+        on_change=salvar_widget,
+        args=('meses',)
+    )
+
+    st.session_state[CHAVE_ESTADO] = {
+        'acesso': estado['acesso'] if padrao_da_pagina else list(filtros_acesso),
+        'acesso_alterado': estado['acesso_alterado'],
+        'cronico': filtro_cronico,
+        'anos': (ano_inicial, ano_final),
+        'meses': list(meses_selecionados),
+    }
+    return {**st.session_state[CHAVE_ESTADO], 'acesso': list(filtros_acesso)}
+
+def anos_selecionados(filtros):
+    ano_inicial, ano_final = filtros['anos']
+    return list(range(ano_inicial, ano_final + 1))
+
+def dados_filtrados(filtros):
+    # Mesma visão filtrada em todas as páginas (resultado compartilhado pelo
+    # cache de filtros de filtro.py)
+    with medir("Filtrar dados"):
+        df_filtrado, _, _, _ = load_and_filter_data(
+            filtro_acesso_default=False,
+            filtro_cronico_default=filtros['cronico'],
+            filtros_acesso=filtros['acesso'],
+            anos_selecionados=anos_selecionados(filtros),
+            meses_selecionados=filtros['meses']
+        )
+    return df_filtrado
+
+def cubo_filtrado(filtros):
+    return carregar_cubo_filtrado(
+        filtros['acesso'],
+        filtros['cronico'],
+        anos_selecionados(filtros),
+        filtros['meses']
+    )
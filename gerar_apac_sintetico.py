@@ -0,0 +1,218 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Gera arquivos ATDRS.csv e ACFRS.csv sintéticos no layout APAC do DATASUS
+# (separador ';', ISO-8859-1, valores entre aspas), para medir o desempenho de
+# dados.py e do dashboard sem os arquivos reais. A mesma semente e o mesmo
+# número de linhas produzem sempre os mesmos arquivos.
+
+ARQUIVO_MUNICIPIOS = './municipios_rs.csv'
+CODIGO_PORTO_ALEGRE = '431490'
+
+# Fração dos pacientes atendidos em Porto Alegre e fora do RS; os demais se
+# distribuem entre os municípios do RS com peso decrescente (lei de Zipf)
+FRACAO_PORTO_ALEGRE = 0.25
+FRACAO_FORA_RS = 0.02
+CODIGOS_FORA_RS = ['420540', '421660', '410690', '355030']
+
+# Unidades de diálise de Porto Alegre (CNES); nos demais municípios os códigos são sintéticos
+CNES_PORTO_ALEGRE = [
+    '2237253', '2237571', '2237598', '2237601', '2262460',
+    '2262509', '2262568', '2262584', '2262770', '5844762'
+]
+
+# Cada paciente em diálise gera em média este número de APACs mensais no ATDRS
+APACS_POR_PACIENTE = 12
+# Razão entre as linhas do ACFRS e as do ATDRS
+FRACAO_LINHAS_FAV = 0.15
+# Parte das APACs de FAV é de pacientes sem registro de diálise
+FRACAO_FAV_SEM_DIALISE = 0.2
+
+# Janela das datas de início de tratamento
+INICIO_PERIODO = np.datetime64('2012-01-01')
+DIAS_PERIODO = 14 * 365
+
+# Peculiaridades encontradas nos arquivos reais
+FRACAO_DATA_VAZIA = 0.005
+FRACAO_DATA_INVALIDA = 0.002
+FRACAO_SEM_ASPAS = 0.05
+FRACAO_COM_ESPACOS = 0.01
+FRACAO_RACA_SEM_ZERO = 0.1
+
+LINHAS_POR_BLOCO = 500_000
+
+COLUNAS_COMUNS = [
+    'AP_MVM', 'AP_CONDIC', 'AP_GESTAO', 'AP_CODUNI', 'AP_UFMUN', 'AP_TPAPAC',
+    'AP_NUIDADE', 'AP_SEXO', 'AP_RACACOR', 'AP_MUNPCN', 'AP_UFNACIO', 'AP_CEPPCN',
+    'AP_DTINIC', 'AP_DTFIM', 'AP_CIDPRI'
+]
+COLUNAS_DIALISE = COLUNAS_COMUNS + ['ATD_ACEVAS', 'ATD_CARACT', 'ATD_SEAPTO', 'ATD_OBSERVAÇÃO']
+COLUNAS_FAV = COLUNAS_COMUNS + ['ACF_DUPLEX', 'ACF_ARTDIA']
+
+def sortear_municipios(rng, n, arquivo_municipios):
+    codigos_rs = pd.read_csv(arquivo_municipios, dtype={'codigo': str})['codigo'].str[:6]
+    codigos_rs = codigos_rs[codigos_rs != CODIGO_PORTO_ALEGRE].to_numpy()
+    pesos = 1 / np.arange(1, len(codigos_rs) + 1)
+    municipios = rng.choice(codigos_rs, n, p=pesos / pesos.sum())
+
+    sorteio = rng.random(n)
+    municipios[sorteio < FRACAO_PORTO_ALEGRE] = CODIGO_PORTO_ALEGRE
+    fora_rs = sorteio > 1 - FRACAO_FORA_RS
+    municipios[fora_rs] = rng.choice(CODIGOS_FORA_RS, fora_rs.sum())
+    return municipios
+
+def gerar_pacientes(rng, n, arquivo_municipios):
+    municipios = sortear_municipios(rng, n, arquivo_municipios)
+    # A maioria reside no município de atendimento
+    residencia = np.where(rng.random(n) < 0.7, municipios, sortear_municipios(rng, n, arquivo_municipios))
+
+    em_porto_alegre = municipios == CODIGO_PORTO_ALEGRE
+    cnes = np.char.zfill(rng.integers(2_000_000, 9_999_999, n).astype(str), 7)
+    cnes[em_porto_alegre] = rng.choice(CNES_PORTO_ALEGRE, em_porto_alegre.sum())
+
+    racas = rng.choice(['01', '02', '03', '04', '05', '99'], n, p=[0.7, 0.08, 0.12, 0.01, 0.01, 0.08])
+    return pd.DataFrame({
+        'AP_UFMUN': municipios,
+        'AP_MUNPCN': residencia,
+        'AP_CODUNI': cnes,
+        'AP_SEXO': rng.choice(['M', 'F'], n, p=[0.58, 0.42]),
+        'AP_RACACOR': racas,
+        'AP_CEPPCN': np.char.zfill(rng.integers(90_000_000, 99_999_999, n).astype(str), 8),
+        'AP_UFNACIO': rng.choice(['010', '020', '034'], n, p=[0.97, 0.02, 0.01]),
+        'IDADE': np.clip(rng.normal(58, 15, n), 0, 99).astype(int),
+        'INICIO': INICIO_PERIODO + rng.integers(0, DIAS_PERIODO, n).astype('timedelta64[D]'),
+        'ACESSO': rng.choice(['1', '2', '3', '4'], n, p=[0.3, 0.5, 0.15, 0.05]),
+    })
+
+def formatar_datas(rng, datas):
+    texto = pd.Series(datas).dt.strftime('%Y%m%d').to_numpy(dtype=object)
+    sorteio = rng.random(len(texto))
+    texto[sorteio < FRACAO_DATA_VAZIA] = ''
+    texto[sorteio > 1 - FRACAO_DATA_INVALIDA] = '00000000'
+    return texto
+
+def montar_bloco(rng, pacientes, linhas_pacientes, datas, colunas_extras):
+    n = len(linhas_pacientes)
+    p = pacientes.iloc[linhas_pacientes]
+    datas_texto = formatar_datas(rng, datas)
+    idade = p['IDADE'].to_numpy() + ((datas - p['INICIO'].to_numpy()).astype('timedelta64[D]').astype(int) // 365)
+
+    racas = p['AP_RACACOR'].to_numpy(dtype=object).copy()
+    sem_zero = rng.random(n) < FRACAO_RACA_SEM_ZERO
+    racas[sem_zero] = [r.lstrip('0') or '0' for r in racas[sem_zero]]
+
+    valores = {
+        'AP_MVM': pd.Series(datas).dt.strftime('%Y%m').to_numpy(dtype=object),
+        'AP_CONDIC': np.full(n, 'EP', dtype=object),
+        'AP_GESTAO': np.full(n, '430000', dtype=object),
+        'AP_CODUNI': p['AP_CODUNI'].to_numpy(dtype=object),
+        'AP_UFMUN': p['AP_UFMUN'].to_numpy(dtype=object),
+        'AP_TPAPAC': rng.choice(['1', '2'], n).astype(object),
+        'AP_NUIDADE': np.char.zfill(np.clip(idade, 0, 120).astype(str), 3).astype(object),
+        'AP_SEXO': p['AP_SEXO'].to_numpy(dtype=object),
+        'AP_RACACOR': racas,
+        'AP_MUNPCN': p['AP_MUNPCN'].to_numpy(dtype=object),
+        'AP_UFNACIO': p['AP_UFNACIO'].to_numpy(dtype=object),
+        'AP_CEPPCN': p['AP_CEPPCN'].to_numpy(dtype=object),
+        'AP_DTINIC': datas_texto,
+        'AP_DTFIM': datas_texto,
+        'AP_CIDPRI': rng.choice(['N180', 'N189', 'N185'], n).astype(object),
+    }
+    valores.update(colunas_extras(rng, p, n))
+
+    bloco = pd.DataFrame(valores)
+    # Espaços sobrando dentro das aspas em alguns códigos de município
+    com_espacos = rng.random(n) < FRACAO_COM_ESPACOS
+    bloco.loc[com_espacos, 'AP_UFMUN'] = bloco.loc[com_espacos, 'AP_UFMUN'] + ' '
+
+    # Os valores vêm entre aspas, exceto em algumas colunas numéricas de parte das linhas
+    sem_aspas = rng.random(n) < FRACAO_SEM_ASPAS
+    for col in bloco.columns:
+        com_aspas = '"' + bloco[col] + '"'
+        if col in ('AP_NUIDADE', 'AP_TPAPAC'):
+            com_aspas = com_aspas.where(~sem_aspas, bloco[col])
+        bloco[col] = com_aspas
+
+    primeira, *demais = bloco.columns
+    return bloco[primeira].str.cat([bloco[col] for col in demais], sep=';')
+
+def gravar_arquivo(caminho, colunas, blocos):
+    # Cabeçalho com a capitalização e as aspas dos arquivos reais
+    cabecalho = ';'.join(f'"{col.lower() if col == "AP_MVM" else col}"' for col in colunas)
+    with open(caminho, 'w', encoding='iso-8859-1', newline='') as arquivo:
+        arquivo.write(cabecalho + '\r\n')
+        for linhas in blocos:
+            arquivo.write('\r\n'.join(linhas) + '\r\n')
+
+def extras_dialise(rng, pacientes, n):
+    return {
+        'ATD_ACEVAS': pacientes['ACESSO'].to_numpy(dtype=object),
+        'ATD_CARACT': rng.choice(['1', '2'], n).astype(object),
+        'ATD_SEAPTO': rng.choice(['S', 'N'], n).astype(object),
+        'ATD_OBSERVAÇÃO': rng.choice(['', 'HEMODIÁLISE', 'SESSÃO EXTRA'], n).astype(object),
+    }
+
+def extras_fav(rng, pacientes, n):
+    return {
+        'ACF_DUPLEX': rng.choice(['S', 'N'], n).astype(object),
+        'ACF_ARTDIA': np.char.zfill(rng.integers(2, 6, n).astype(str), 2).astype(object),
+    }
+
+def blocos_dialise(rng, pacientes, linhas, pesos):
+    # APACs mensais a partir do início do tratamento; pacientes com peso maior
+    # (tratamentos mais longos) aparecem mais vezes
+    for inicio in range(0, linhas, LINHAS_POR_BLOCO):
+        n = min(LINHAS_POR_BLOCO, linhas - inicio)
+        ids = rng.choice(len(pacientes), n, p=pesos)
+        meses = rng.geometric(1 / APACS_POR_PACIENTE, n) - 1
+        datas = pacientes['INICIO'].to_numpy()[ids] + (meses * 30 + rng.integers(0, 5, n)).astype('timedelta64[D]')
+        yield montar_bloco(rng, pacientes, ids, datas, extras_dialise)
+
+def blocos_fav(rng, pacientes, pacientes_sem_dialise, linhas):
+    # Confecção de FAV semanas a meses após o início da diálise (às vezes antes),
+    # com algumas APACs repetidas do mesmo paciente
+    tabela = pd.concat([pacientes, pacientes_sem_dialise], ignore_index=True)
+    for inicio in range(0, linhas, LINHAS_POR_BLOCO):
+        n = min(LINHAS_POR_BLOCO, linhas - inicio)
+        sem_dialise = rng.random(n) < FRACAO_FAV_SEM_DIALISE
+        ids = np.where(
+            sem_dialise,
+            len(pacientes) + rng.integers(0, len(pacientes_sem_dialise), n),
+            rng.integers(0, len(pacientes), n)
+        )
+        espera = np.round(rng.gamma(1.5, 80, n) - rng.exponential(15, n)).astype(int)
+        datas = tabela['INICIO'].to_numpy()[ids] + espera.astype('timedelta64[D]')
+        yield montar_bloco(rng, tabela, ids, datas, extras_fav)
+
+def gerar_apac(pasta, linhas, semente=0, arquivo_municipios=ARQUIVO_MUNICIPIOS):
+    rng = np.random.default_rng(semente)
+    os.makedirs(pasta, exist_ok=True)
+
+    n_pacientes = max(linhas // APACS_POR_PACIENTE, 10)
+    pacientes = gerar_pacientes(rng, n_pacientes, arquivo_municipios)
+    pacientes_sem_dialise = gerar_pacientes(rng, max(n_pacientes // 10, 1), arquivo_municipios)
+    pesos = rng.gamma(0.7, 1, n_pacientes)
+    pesos /= pesos.sum()
+
+    caminho_dialise = os.path.join(pasta, 'ATDRS.csv')
+    caminho_fav = os.path.join(pasta, 'ACFRS.csv')
+    gravar_arquivo(caminho_dialise, COLUNAS_DIALISE, blocos_dialise(rng, pacientes, linhas, pesos))
+    gravar_arquivo(caminho_fav, COLUNAS_FAV, blocos_fav(rng, pacientes, pacientes_sem_dialise, max(int(linhas * FRACAO_LINHAS_FAV), 1)))
+    return caminho_dialise, caminho_fav
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera arquivos APAC (ATDRS/ACFRS) sintéticos para testes de desempenho.")
+    parser.add_argument('--linhas', type=int, default=100_000, help="Número de linhas do ATDRS (de 10 mil a 50 milhões)")
+    parser.add_argument('--semente', type=int, default=0, help="Semente do gerador aleatório")
+    parser.add_argument('--pasta', default='./dados_sinteticos', help="Pasta onde os arquivos serão gravados")
+    parser.add_argument('--municipios', default=ARQUIVO_MUNICIPIOS, help="Arquivo com os códigos IBGE dos municípios do RS")
+    args = parser.parse_args()
+
+    for caminho in gerar_apac(args.pasta, args.linhas, args.semente, args.municipios):
+        print(f"Arquivo gerado: {caminho} ({os.path.getsize(caminho) / 1e6:.1f} MB)")
+
+if __name__ == '__main__':
+    main()
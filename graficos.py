@@ -0,0 +1,178 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Dados dos gráficos calculados no servidor: em vez de enviar todos os pacientes
+# ao navegador, as figuras recebem apenas estatísticas e uma amostra limitada
+
+# Número máximo de pontos desenhados sobre os boxplots resumidos
+LIMITE_PONTOS_BOXPLOT = 2000
+# Seleções até este tamanho podem ser desenhadas com todos os pontos
+LIMITE_DETALHE_COMPLETO = 5000
+
+COR_PADRAO = px.colors.qualitative.Plotly[0]
+
+COLUNAS_ESTATISTICAS = [
+    'q1', 'mediana', 'q3', 'media', 'minimo', 'maximo', 'n',
+    'bigode_inferior', 'bigode_superior', 'outliers'
+]
+
+def estatisticas_boxplot(df, grupo, valor):
+    # Quartis (interpolação linear, como no Plotly), média e bigodes de cada
+    # grupo; os bigodes vão até o valor mais extremo dentro de 1,5 IQR
+    agrupado = df.groupby(grupo, observed=True, sort=True)[valor]
+    if agrupado.ngroups == 0:
+        # Seleção vazia ou grupo sempre ausente (ex.: faixa etária fora das faixas)
+        return pd.DataFrame(columns=COLUNAS_ESTATISTICAS, index=pd.Index([], name=grupo))
+    estatisticas = agrupado.quantile([0.25, 0.5, 0.75]).unstack()
+    estatisticas.columns = ['q1', 'mediana', 'q3']
+    estatisticas['media'] = agrupado.mean()
+    estatisticas['minimo'] = agrupado.min()
+    estatisticas['maximo'] = agrupado.max()
+    estatisticas['n'] = agrupado.size()
+
+    iqr = estatisticas['q3'] - estatisticas['q1']
+    limite_inferior = df[grupo].map(estatisticas['q1'] - 1.5 * iqr).astype(float)
+    limite_superior = df[grupo].map(estatisticas['q3'] + 1.5 * iqr).astype(float)
+    valores = df[valor]
+    dentro = (valores >= limite_inferior) & (valores <= limite_superior)
+    estatisticas['bigode_inferior'] = valores[dentro].groupby(df[grupo][dentro], observed=True).min()
+    estatisticas['bigode_superior'] = valores[dentro].groupby(df[grupo][dentro], observed=True).max()
+    estatisticas['outliers'] = (~dentro & valores.notna()).groupby(df[grupo], observed=True).sum()
+    return estatisticas[estatisticas['n'] > 0]
+
+def amostra_estratificada(df, grupo, limite=LIMITE_PONTOS_BOXPLOT, semente=0):
+    # Amostra de até `limite` linhas com cada grupo representado na proporção
+    # do seu tamanho (no mínimo uma linha); o mínimo e o máximo de cada grupo
+    # entram sempre, para que a amplitude continue visível
+    if len(df) <= limite:
+        return df
+    tamanhos = df.groupby(grupo, observed=True).size()
+    cotas = np.maximum(np.floor(tamanhos * limite / len(df)), 1).astype(int)
+    rng = np.random.default_rng(semente)
+    chaves = rng.random(len(df))
+    posicao = pd.Series(chaves, index=df.index).groupby(df[grupo], observed=True).rank(method='first')
+    selecionadas = posicao <= df[grupo].map(cotas).astype(float)
+    return df[selecionadas]
+
+def extremos_por_grupo(df, grupo, valor):
+    agrupado = df.groupby(grupo, observed=True)[valor]
+    indices = pd.concat([agrupado.idxmin(), agrupado.idxmax()]).dropna().unique()
+    return df.loc[indices]
+
+def boxplot_resumido(df, x, y, labels=None, title=None, limite_pontos=LIMITE_PONTOS_BOXPLOT):
+    # Caixa de cada grupo desenhada a partir das estatísticas calculadas aqui,
+    # mais uma amostra estratificada de pontos
+    labels = labels or {}
+    dados = df[[x, y]].dropna()
+    estatisticas = estatisticas_boxplot(dados, x, y)
+    categorias = estatisticas.index.astype(str).tolist()
+
+    amostra = amostra_estratificada(dados, x, limite_pontos)
+    amostra = pd.concat([amostra, extremos_por_grupo(dados, x, y)])
+    amostra = amostra[~amostra.index.duplicated()]
+
+    fig = go.Figure()
+    fig.add_trace(go.Box(
+        x=categorias,
+        q1=estatisticas['q1'], median=estatisticas['mediana'], q3=estatisticas['q3'],
+        lowerfence=estatisticas['bigode_inferior'], upperfence=estatisticas['bigode_superior'],
+        mean=estatisticas['media'],
+        marker_color=COR_PADRAO, boxpoints=False, name='', showlegend=False,
+        hovertemplate="%{x}<br>Q1: %{q1}<br>Mediana: %{median}<br>Q3: %{q3}<extra></extra>"
+    ))
+    # Pontos da amostra, com a caixa do traço invisível (só os pontos aparecem)
+    fig.add_trace(go.Box(
+        x=amostra[x].astype(str), y=amostra[y],
+        boxpoints='all', jitter=0.3, pointpos=0,
+        fillcolor='rgba(0,0,0,0)', line_width=0, marker=dict(color=COR_PADRAO, size=3, opacity=0.5),
+        hoveron='points', name='', showlegend=False
+    ))
+
+    n_total = int(estatisticas['n'].sum())
+    fig.update_layout(
+        title=title,
+        boxmode='overlay',
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+        xaxis=dict(categoryorder='array', categoryarray=categorias)
+    )
+    if len(amostra) < n_total:
+        fig.add_annotation(
+            text=f"Pontos: amostra de {len(amostra)} de {n_total} pacientes",
+            xref='paper', yref='paper', x=1, y=1.06, showarrow=False, font=dict(size=11)
+        )
+    return fig
+
+def figura_boxplot(df, x, y, labels=None, title=None, detalhe_completo=False):
+    # Com detalhe completo (seleções pequenas), todos os pacientes vão ao navegador
+    if detalhe_completo:
+        return px.box(df, x=x, y=y, points="all", labels=labels, title=title)
+    return boxplot_resumido(df, x, y, labels=labels, title=title)
+
+def histograma(valores, nbins=50):
+    # Contagens em classes de largura inteira (os tempos são em dias), com
+    # cerca de nbins classes entre o mínimo e o máximo
+    valores = pd.Series(valores).dropna().to_numpy(dtype=float)
+    if valores.size == 0:
+        return pd.DataFrame({'inicio': [], 'fim': [], 'N': []}, dtype=float)
+    minimo, maximo = np.floor(valores.min()), np.floor(valores.max())
+    largura = max(np.ceil((maximo - minimo + 1) / nbins), 1)
+    bordas = minimo + largura * np.arange(int((maximo - minimo) // largura) + 2)
+    contagens, _ = np.histogram(valores, bins=bordas)
+    return pd.DataFrame({'inicio': bordas[:-1], 'fim': bordas[1:], 'N': contagens})
+
+def figura_histograma(df, coluna, nbins=50, labels=None, title=None, intervalo_barras=0.1):
+    # Histograma com boxplot marginal, ambos calculados no servidor: o
+    # navegador recebe só as classes e os cinco números do boxplot
+    labels = labels or {}
+    classes = histograma(df[coluna], nbins)
+    dados = df[[coluna]].dropna().assign(_grupo='')
+    estatisticas = estatisticas_boxplot(dados, '_grupo', coluna)
+
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    if not estatisticas.empty:
+        caixa = estatisticas.iloc[0]
+        fig.add_trace(go.Box(
+            y=[''], q1=[caixa['q1']], median=[caixa['mediana']], q3=[caixa['q3']],
+            lowerfence=[caixa['bigode_inferior']], upperfence=[caixa['bigode_superior']],
+            orientation='h', marker_color=COR_PADRAO, boxpoints=False, showlegend=False, name=''
+        ), row=1, col=1)
+    fig.add_trace(go.Bar(
+        x=(classes['inicio'] + classes['fim']) / 2, y=classes['N'],
+        width=(classes['fim'] - classes['inicio']) * (1 - intervalo_barras),
+        customdata=classes[['inicio', 'fim']].to_numpy() - [0, 1],
+        hovertemplate="%{customdata[0]:.0f}–%{customdata[1]:.0f}: %{y}<extra></extra>",
+        marker_color=COR_PADRAO, showlegend=False, name=''
+    ), row=2, col=1)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_xaxes(title_text=labels.get(coluna, coluna), row=2, col=1)
+    fig.update_yaxes(title_text=labels.get('N', 'N'), row=2, col=1)
+    fig.update_layout(title=title)
+    return fig
+
+def boxplot_altair(df, x, y, titulo_x=None, titulo_y=None, title=None, width=700, height=350):
+    # Equivalente a mark_boxplot(extent='min-max') a partir das estatísticas por
+    # grupo: uma linha por grupo em vez de um ponto por paciente
+    estatisticas = estatisticas_boxplot(df[[x, y]].dropna(), x, y).reset_index()
+    estatisticas = estatisticas[[x, 'minimo', 'q1', 'mediana', 'q3', 'maximo', 'n']]
+    base = alt.Chart(estatisticas).encode(x=alt.X(f"{x}:O", title=titulo_x or x))
+    tooltip = [
+        alt.Tooltip(f"{x}:O", title=titulo_x or x),
+        alt.Tooltip('n:Q', title='Pacientes'),
+        alt.Tooltip('minimo:Q', title='Mínimo'),
+        alt.Tooltip('q1:Q', title='Q1'),
+        alt.Tooltip('mediana:Q', title='Mediana'),
+        alt.Tooltip('q3:Q', title='Q3'),
+        alt.Tooltip('maximo:Q', title='Máximo'),
+    ]
+    bigodes = base.mark_rule().encode(
+        y=alt.Y('minimo:Q', title=titulo_y or y), y2='maximo:Q', tooltip=tooltip
+    )
+    caixas = base.mark_bar(size=14).encode(y='q1:Q', y2='q3:Q', tooltip=tooltip)
+    medianas = base.mark_tick(color='white', size=14).encode(y='mediana:Q', tooltip=tooltip)
+    grafico = (bigodes + caixas + medianas).properties(width=width, height=height)
+    return grafico.properties(title=title) if title else grafico
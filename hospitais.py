@@ -0,0 +1,40 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Dimensão de unidades de diálise, a partir da referência local do CNES
+# (hospitais_cnes.csv: código CNES de 7 dígitos e nome). Novas unidades entram
+# acrescentando linhas ao arquivo; códigos fora dele aparecem como
+# NOME_DESCONHECIDO.
+
+ARQUIVO_HOSPITAIS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hospitais_cnes.csv')
+NOME_DESCONHECIDO = "Desconhecido"
+
+@lru_cache(maxsize=4)
+def dimensao_hospitais(arquivo_hospitais=ARQUIVO_HOSPITAIS):
+    # O dicionário retornado é compartilhado; não deve ser alterado
+    df_hospitais = pd.read_csv(arquivo_hospitais, dtype={'cnes': str})
+    return {
+        'codigos': pd.Index(normalizar_cnes(df_hospitais['cnes'])),
+        'nomes': pd.Index(df_hospitais['nome'].tolist() + [NOME_DESCONHECIDO]),
+    }
+
+def normalizar_cnes(valores):
+    # Códigos lidos como números perdem os zeros à esquerda
+    return pd.Series(valores, dtype=object).astype(str).str.strip().str.removesuffix('.0').str.zfill(7)
+
+def nomes_hospitais(serie, dimensao=None):
+    # Nome da unidade de cada código, como Categorical com as categorias da
+    # dimensão; só os códigos distintos são normalizados e procurados
+    dimensao = dimensao or dimensao_hospitais()
+    categorias = serie.astype('category').cat
+    desconhecido = len(dimensao['nomes']) - 1
+    posicoes = dimensao['codigos'].get_indexer(normalizar_cnes(categorias.categories))
+    # A posição extra no fim recebe os valores ausentes (código -1)
+    posicoes = np.append(np.where(posicoes >= 0, posicoes, desconhecido), desconhecido)
+    return pd.Series(
+        pd.Categorical.from_codes(posicoes[categorias.codes.to_numpy()], categories=dimensao['nomes']),
+        index=serie.index, name=serie.name
+    )
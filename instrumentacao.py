@@ -0,0 +1,92 @@
+import contextlib
+import json
+import os
+import platform
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Relatório de execução de dados.py: para cada etapa, tempo de relógio, tempo de
+# CPU (do processo e dos processos filhos encerrados na etapa), pico de memória
+# e linhas de entrada, de saída e descartadas por motivo.
+
+ARQUIVO_STATUS = '/proc/self/status'
+ARQUIVO_CLEAR_REFS = '/proc/self/clear_refs'
+
+def reiniciar_pico_memoria():
+    # No Linux, escrever 5 em clear_refs zera o pico de memória (VmHWM) do
+    # processo, o que permite medir o pico de cada etapa isoladamente
+    try:
+        with open(ARQUIVO_CLEAR_REFS, 'w') as arquivo:
+            arquivo.write('5')
+        return True
+    except OSError:
+        return False
+
+def pico_memoria_mb():
+    try:
+        with open(ARQUIVO_STATUS) as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # Sem /proc, só há o pico desde o início do processo (KB no Linux, bytes no macOS)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if platform.system() == 'Darwin' else pico / 1024
+
+def tempo_cpu_filhos():
+    tempos = os.times()
+    return tempos.children_user + tempos.children_system
+
+class RelatorioExecucao:
+    def __init__(self, **metadados):
+        self.metadados = {'inicio': datetime.now().isoformat(timespec='seconds'), **metadados}
+        self.etapas = []
+        self._inicio = time.perf_counter()
+        self._inicio_cpu = time.process_time() + tempo_cpu_filhos()
+
+    @contextlib.contextmanager
+    def etapa(self, nome):
+        # O bloco pode completar o registro com linhas_saida e, em
+        # linhas_descartadas, a contagem de linhas removidas por motivo
+        registro = {'etapa': nome, 'linhas_entrada': None, 'linhas_saida': None, 'linhas_descartadas': {}}
+        pico_por_etapa = reiniciar_pico_memoria()
+        inicio = time.perf_counter()
+        inicio_cpu = time.process_time()
+        inicio_cpu_filhos = tempo_cpu_filhos()
+        try:
+            yield registro
+        finally:
+            registro['segundos'] = round(time.perf_counter() - inicio, 3)
+            registro['segundos_cpu'] = round(time.process_time() - inicio_cpu, 3)
+            registro['segundos_cpu_processos_filhos'] = round(tempo_cpu_filhos() - inicio_cpu_filhos, 3)
+            pico = pico_memoria_mb()
+            registro['pico_memoria_mb'] = round(pico, 1) if pico is not None else None
+            registro['pico_memoria_desde_inicio'] = not pico_por_etapa
+            self.etapas.append(registro)
+
+    def resumo(self):
+        return {
+            **self.metadados,
+            'segundos_total': round(time.perf_counter() - self._inicio, 3),
+            'segundos_cpu_total': round(time.process_time() + tempo_cpu_filhos() - self._inicio_cpu, 3),
+            'etapas': self.etapas,
+        }
+
+    def gravar(self, caminho_json):
+        with open(caminho_json, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.resumo(), arquivo, ensure_ascii=False, indent=2, default=str)
+        return caminho_json
+
+def registrar_descarte(registro, motivo, linhas_antes, linhas_depois):
+    # Soma as linhas de entrada/saída do passo ao registro da etapa
+    registro['linhas_entrada'] = (registro['linhas_entrada'] or 0) + int(linhas_antes)
+    registro['linhas_saida'] = (registro['linhas_saida'] or 0) + int(linhas_depois)
+    registro['linhas_descartadas'][motivo] = registro['linhas_descartadas'].get(motivo, 0) + int(linhas_antes - linhas_depois)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from categorias import aplicar_categorias, categorias_presentes
+
+# Manifesto da base do dashboard (<prefixo>_manifesto.json), gravado por dados.py
+# ao lado do CSV: valores distintos de cada dimensão dos filtros, datas mínima e
+# máxima, contagens por ano e por tipo de acesso, versão do esquema e hash do
+# conteúdo. O dashboard monta a barra lateral a partir dele e usa o hash como
+# chave dos caches.
+
+# Aumentar sempre que mudarem as colunas da base, o formato do cubo ou o do
+# manifesto
+VERSAO_ESQUEMA = 3
+
+DIMENSOES_MANIFESTO = [
+    'ACESSO_VASCULAR_INICIAL', 'CRONICO_3_MESES', 'SEXO', 'FAIXA_ETARIA',
+    'RACA_COR', 'COD_UNIDADE_HOSPITALAR', 'NOME_HOSPITAL', 'ANO_FAV', 'MES_FAV'
+]
+COLUNAS_DATA = ['DATA_INICIO_DIALISE', 'DATA_CRIACAO_FAV']
+TAMANHO_BLOCO_HASH = 1 << 20
+
+def caminho_manifesto(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + "_manifesto.json"
+
+def hash_arquivo(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+def valores_json(serie):
+    # Valores distintos ordenados (categorias na ordem do tipo), em tipos nativos do Python
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return categorias_presentes(serie)
+    valores = pd.Series(serie.dropna().unique())
+    return sorted(valores.tolist(), key=lambda valor: (str(type(valor)), valor))
+
+def contagens_json(serie):
+    return {str(valor): int(n) for valor, n in serie.value_counts(sort=False).sort_index().items()}
+
+def construir_manifesto(df, caminho_csv):
+    colunas = list(df.columns)
+    df = aplicar_categorias(df.copy()).assign(
+        ANO_FAV=df['DATA_CRIACAO_FAV'].dt.year.astype('Int64'),
+        MES_FAV=df['DATA_CRIACAO_FAV'].dt.month.astype('Int64')
+    )
+    return {
+        'versao_esquema': VERSAO_ESQUEMA,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'arquivo': os.path.basename(caminho_csv),
+        'hash_conteudo': hash_arquivo(caminho_csv),
+        'linhas': len(df),
+        'colunas': colunas,
+        'valores_distintos': {dimensao: valores_json(df[dimensao]) for dimensao in DIMENSOES_MANIFESTO},
+        'datas': {
+            coluna: {
+                'min': df[coluna].min().date().isoformat(),
+                'max': df[coluna].max().date().isoformat(),
+            }
+            for coluna in COLUNAS_DATA
+        },
+        'linhas_por_ano': contagens_json(df['ANO_FAV']),
+        'linhas_por_acesso': contagens_json(df['ACESSO_VASCULAR_INICIAL']),
+    }
+
+def gravar_manifesto(df, caminho_csv):
+    # Deve ser chamado depois de gravar o CSV, cujo conteúdo entra no hash
+    caminho = caminho_manifesto(caminho_csv)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(construir_manifesto(df, caminho_csv), arquivo, ensure_ascii=False, indent=2)
+    return caminho
+
+def ler_manifesto(caminho_csv):
+    # None se o manifesto não existir, for mais antigo que o CSV ou de outra
+    # versão do esquema; nesses casos o dashboard recorre à própria base
+    caminho = caminho_manifesto(caminho_csv)
+    if not os.path.exists(caminho) or (
+        os.path.exists(caminho_csv) and os.path.getmtime(caminho) < os.path.getmtime(caminho_csv)
+    ):
+        return None
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if manifesto.get('versao_esquema') != VERSAO_ESQUEMA:
+        return None
+    return manifesto
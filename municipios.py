@@ -0,0 +1,60 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Dimensão de municípios do RS, carregada uma vez por processo a partir de
+# municipios_rs.csv (código IBGE de 7 dígitos e nome). Os códigos de 6 dígitos
+# (como em AP_UFMUN e AP_MUNPCN) indexam diretamente um array de posições, de
+# modo que resolver os nomes de uma coluna inteira é um único take do NumPy.
+
+ARQUIVO_MUNICIPIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'municipios_rs.csv')
+NOME_NAO_INFORMADO = "Não informado"
+
+# Códigos de 6 dígitos vão de 0 a 999999
+TAMANHO_INDICE = 1_000_000
+
+@lru_cache(maxsize=4)
+def dimensao_municipios(arquivo_municipios=ARQUIVO_MUNICIPIOS):
+    # O dicionário retornado é compartilhado; não deve ser alterado
+    df_municipios = pd.read_csv(arquivo_municipios, dtype={'codigo': str})
+    codigos = df_municipios['codigo'].str[:6]
+    # A última posição de `nomes` recebe os códigos ausentes ou fora do RS
+    indice = np.full(TAMANHO_INDICE, len(df_municipios), dtype=np.int32)
+    indice[codigos.astype(np.int64).to_numpy()] = np.arange(len(df_municipios), dtype=np.int32)
+    return {
+        'codigos': codigos.tolist(),
+        'nomes': pd.Index(df_municipios['nome'].tolist() + [NOME_NAO_INFORMADO]),
+        'indice': indice,
+    }
+
+def truncar_seis_digitos(serie):
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        excesso = np.maximum(np.floor(np.log10(np.maximum(valores, 1))) - 5, 0)
+    return np.floor(valores / 10 ** excesso)
+
+def codigos_seis_digitos(serie):
+    # Equivale a str[:6].zfill(6) sobre o código, mas em aritmética: códigos de
+    # 7 dígitos (com dígito verificador) perdem os últimos dígitos
+    if pd.api.types.is_numeric_dtype(serie):
+        return truncar_seis_digitos(serie)
+    # Texto ou categoria: converte só os valores distintos e espalha pelos códigos
+    categorias = serie.astype('category').cat
+    # A posição extra no fim recebe os valores ausentes (código -1)
+    por_categoria = np.append(truncar_seis_digitos(pd.Series(categorias.categories)), np.nan)
+    return por_categoria[categorias.codes.to_numpy()]
+
+def nomes_municipios(serie, dimensao=None):
+    # Nome do município de cada código, como Categorical com as categorias da
+    # dimensão; códigos ausentes ou desconhecidos viram NOME_NAO_INFORMADO
+    dimensao = dimensao or dimensao_municipios()
+    valores = codigos_seis_digitos(serie)
+    validos = (valores >= 0) & (valores < TAMANHO_INDICE)
+    posicoes = np.full(len(valores), len(dimensao['nomes']) - 1, dtype=np.int32)
+    posicoes[validos] = dimensao['indice'].take(valores[validos].astype(np.int64))
+    return pd.Series(
+        pd.Categorical.from_codes(posicoes, categories=dimensao['nomes']),
+        index=serie.index, name=serie.name
+    )
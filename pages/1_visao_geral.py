@@ -1,65 +1,47 @@
 import streamlit as st
-import plotly.express as px
-from filtro import load_and_filter_data
+from filtros_globais import barra_lateral_filtros, dados_filtrados, cubo_filtrado
+from agregados import resumir_cubo
+from exportacao import botao_exportacao
+from perfil import iniciar_perfil, medir
+from graficos import figura_boxplot, figura_histograma, LIMITE_DETALHE_COMPLETO
 
 st.set_page_config(
     page_title="1. Visão Geral do Tempo de Espera para FAV",
     page_icon="🩺",
     layout="wide"
 )
+iniciar_perfil("1_visao_geral")
 
-st.sidebar.header("🎛️ Filtros")
-
-# Carregar dados e opções iniciais
-df, opcoes_acesso, anos_disponiveis, meses_disponiveis = load_and_filter_data()
-
-# Filtros interativos
-filtro_acesso = st.sidebar.multiselect(
-    "Tipo de Acesso Vascular",
-    options=opcoes_acesso,
-    default=[ac for ac in opcoes_acesso if "Fístula" in ac]
-)
-
-filtro_cronico = st.sidebar.checkbox(
-    "Mostrar apenas pacientes crônicos (≥ 3 meses em diálise)",
-    value=True
-)
-
-anos_selecionados = st.sidebar.multiselect(
-    "Ano da criação da FAV",
-    options=anos_disponiveis,
-    default=anos_disponiveis
-)
-
-meses_selecionados = st.sidebar.multiselect(
-    "Mês da criação da FAV",
-    options=meses_disponiveis,
-    format_func=lambda x: f"{x:02d}",
-    default=meses_disponiveis
-)
-
-# Aplicar filtros nos dados
-df_filtrado, _, _, _ = load_and_filter_data(
-    filtro_acesso_default=False,
-    filtro_cronico_default=filtro_cronico,
-    filtros_acesso=filtro_acesso,
-    anos_selecionados=anos_selecionados,
-    meses_selecionados=meses_selecionados
-)
+# Filtros globais (compartilhados entre as páginas)
+filtros = barra_lateral_filtros()
+df_filtrado = dados_filtrados(filtros)
 
 # Segurança: evitar erros com dataframe vazio
 if df_filtrado.empty or 'TEMPO_ESPERA_DIAS' not in df_filtrado.columns:
     st.warning("Nenhum dado encontrado para os filtros selecionados.")
     st.stop()
 
-# Estatísticas principais
-n_pacientes = len(df_filtrado)
-tempo_medio = df_filtrado['TEMPO_ESPERA_DIAS'].mean()
-tempo_median = df_filtrado['TEMPO_ESPERA_DIAS'].median()
-std_desvio = df_filtrado['TEMPO_ESPERA_DIAS'].std()
-percentil_25 = df_filtrado['TEMPO_ESPERA_DIAS'].quantile(0.25)
-percentil_75 = df_filtrado['TEMPO_ESPERA_DIAS'].quantile(0.75)
-prop_acima_180 = (df_filtrado['TEMPO_ESPERA_DIAS'] > 180).mean() * 100
+# Boxplots: acima do limite, caixas calculadas no servidor e amostra dos pontos
+detalhe_disponivel = len(df_filtrado) <= LIMITE_DETALHE_COMPLETO
+detalhe_completo = st.sidebar.checkbox(
+    "Mostrar todos os pacientes nos boxplots",
+    value=False,
+    disabled=not detalhe_disponivel,
+    help=f"Disponível para seleções de até {LIMITE_DETALHE_COMPLETO} pacientes."
+) and detalhe_disponivel
+
+# Estatísticas principais, somadas a partir do cubo de agregados
+with medir("Indicadores (cubo)"):
+    cubo = cubo_filtrado(filtros)
+    resumo = resumir_cubo(cubo).iloc[0]
+n_pacientes = int(resumo['N'])
+tempo_medio = resumo['Media']
+tempo_median = resumo['Mediana']
+std_desvio = resumo['Desvio_Padrao']
+percentil_25 = resumo['P25']
+percentil_75 = resumo['P75']
+prop_acima_180 = resumo['Prop_Acima_180']
+n_unidades = cubo.loc[cubo['N'] > 0, 'COD_UNIDADE_HOSPITALAR'].nunique()
 
 # Título e introdução
 st.title("1. Visão Geral do Tempo de Espera para Fístula Arteriovenosa (FAV)")
@@ -74,7 +56,7 @@ st.markdown(
 col1, col2, col3 = st.columns(3)
 col1.metric("⏱️ Tempo Médio de Espera", f"{tempo_medio:.0f} dias")
 col2.metric("👥 Pacientes Incluídos", f"{n_pacientes}")
-col3.metric("🏥 Unidades Hospitalares", f"{df_filtrado['COD_UNIDADE_HOSPITALAR'].nunique()}")
+col3.metric("🏥 Unidades Hospitalares", f"{n_unidades}")
 
 st.markdown("----")
 
@@ -95,20 +77,16 @@ st.markdown(
 )
 
 # Histograma com boxplot
-fig = px.histogram(
-    df_filtrado,
-    x='TEMPO_ESPERA_DIAS',
-    nbins=50,
-    marginal="box",
-    title="Distribuição do Tempo de Espera para Confecção da FAV",
-    labels={'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'}
-)
-fig.update_layout(
-    xaxis_title="Tempo de Espera (dias)",
-    yaxis_title="Número de Pacientes",
-    bargap=0.1
-)
-st.plotly_chart(fig, use_container_width=True)
+with medir("Histograma: figura"):
+    fig = figura_histograma(
+        df_filtrado,
+        'TEMPO_ESPERA_DIAS',
+        nbins=50,
+        title="Distribuição do Tempo de Espera para Confecção da FAV",
+        labels={'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)', 'N': 'Número de Pacientes'}
+    )
+with medir("Histograma: st.plotly_chart"):
+    st.plotly_chart(fig, use_container_width=True)
 
 # Boxplot por Sexo
 with st.expander("📊 Tempo de Espera por Sexo"):
@@ -118,15 +96,17 @@ with st.expander("📊 Tempo de Espera por Sexo"):
         Avalia se há variação ou desigualdade na linha de cuidado entre homens e mulheres.
         """
     )
-    fig_sexo = px.box(
-        df_filtrado,
-        x='SEXO',
-        y='TEMPO_ESPERA_DIAS',
-        points="all",
-        labels={'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)', 'SEXO': 'Sexo'},
-        title="Tempo de Espera por Sexo"
-    )
-    st.plotly_chart(fig_sexo, use_container_width=True)
+    with medir("Boxplot por sexo: figura"):
+        fig_sexo = figura_boxplot(
+            df_filtrado,
+            x='SEXO',
+            y='TEMPO_ESPERA_DIAS',
+            detalhe_completo=detalhe_completo,
+            labels={'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)', 'SEXO': 'Sexo'},
+            title="Tempo de Espera por Sexo"
+        )
+    with medir("Boxplot por sexo: st.plotly_chart"):
+        st.plotly_chart(fig_sexo, use_container_width=True)
 
 # Boxplot por Raça/Cor
 with st.expander("📊 Tempo de Espera por Raça/Cor"):
@@ -136,15 +116,17 @@ with st.expander("📊 Tempo de Espera por Raça/Cor"):
         Pode ser útil na análise de equidade no acesso ao procedimento.
         """
     )
-    fig_raca = px.box(
-        df_filtrado,
-        x='RACA_COR',
-        y='TEMPO_ESPERA_DIAS',
-        points="all",
-        labels={'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)', 'RACA_COR': 'Raça/Cor'},
-        title="Tempo de Espera por Raça/Cor"
-    )
-    st.plotly_chart(fig_raca, use_container_width=True)
+    with medir("Boxplot por raça/cor: figura"):
+        fig_raca = figura_boxplot(
+            df_filtrado,
+            x='RACA_COR',
+            y='TEMPO_ESPERA_DIAS',
+            detalhe_completo=detalhe_completo,
+            labels={'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)', 'RACA_COR': 'Raça/Cor'},
+            title="Tempo de Espera por Raça/Cor"
+        )
+    with medir("Boxplot por raça/cor: st.plotly_chart"):
+        st.plotly_chart(fig_raca, use_container_width=True)
 
 # Insights automáticos
 st.markdown("----")
@@ -166,13 +148,8 @@ if tempo_median > 300:
 # Exportação de dados
 st.markdown("---")
 with st.expander("📥 Exportar dados filtrados"):
-    csv = df_filtrado.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="📄 Baixar CSV",
-        data=csv,
-        file_name='dados_filtrados_fav.csv',
-        mime='text/csv'
-    )
+    # Arquivo gerado só ao clicar em baixar (ver exportacao.py)
+    botao_exportacao(df_filtrado, 'dados_filtrados_fav')
 
 # Explicação final
 st.markdown("---")
@@ -1,55 +1,19 @@
 import streamlit as st
-import plotly.express as px
-from filtro import load_and_filter_data
+from filtros_globais import barra_lateral_filtros, dados_filtrados
+from exportacao import botao_exportacao
+from perfil import iniciar_perfil, medir
+from graficos import figura_boxplot, LIMITE_DETALHE_COMPLETO
 
 st.set_page_config(
     page_title="2. Análise por Perfil",
     page_icon="👤",
     layout="wide"
 )
+iniciar_perfil("2_analise_por_perfil")
 
-st.sidebar.header("Filtros")
-
-# Carregar dados e opções iniciais
-df, opcoes_acesso, anos_disponiveis, meses_disponiveis = load_and_filter_data()
-
-# Filtros na sidebar
-filtro_acesso = st.sidebar.multiselect(
-    "Tipo de Acesso Vascular",
-    options=opcoes_acesso,
-    default=[ac for ac in opcoes_acesso if "Fístula" in ac]
-)
-
-filtro_cronico = st.sidebar.checkbox(
-    "Mostrar somente pacientes crônicos (≥ 3 meses de tratamento)",
-    value=True
-)
-
-anos_selecionados = st.sidebar.multiselect(
-    "Ano da criação da FAV",
-    options=anos_disponiveis,
-    default=anos_disponiveis
-)
-
-meses_selecionados = st.sidebar.multiselect(
-    "Mês da criação da FAV",
-    options=meses_disponiveis,
-    format_func=lambda x: f"{x:02d}",
-    default=meses_disponiveis
-)
-
-# Aplicar filtro nos dados
-df_filtrado, _, _, _ = load_and_filter_data(
-    filtro_acesso_default=False,
-    filtro_cronico_default=False,
-    filtros_acesso=filtro_acesso,
-    anos_selecionados=anos_selecionados,
-    meses_selecionados=meses_selecionados
-)
-
-# Aplicar filtro de crônico se marcado
-if filtro_cronico:
-    df_filtrado = df_filtrado[df_filtrado['CRONICO_3_MESES'] == True]
+# Filtros globais (compartilhados entre as páginas)
+filtros = barra_lateral_filtros()
+df_filtrado = dados_filtrados(filtros)
 
 # Verificação de segurança: se DataFrame está vazio ou colunas essenciais ausentes
 colunas_necessarias = ['IDADE', 'TEMPO_ESPERA_DIAS']
@@ -82,19 +46,29 @@ idade_range = st.slider(
     value=(idade_min, idade_max)
 )
 
-df_filtrado = df_filtrado[
-    (df_filtrado['IDADE'] >= idade_range[0]) &
-    (df_filtrado['IDADE'] <= idade_range[1])
-    ]
+with medir("Filtro de idade e indicadores"):
+    df_filtrado = df_filtrado[
+        (df_filtrado['IDADE'] >= idade_range[0]) &
+        (df_filtrado['IDADE'] <= idade_range[1])
+        ]
 
-# Métricas principais
-col1, col2, col3 = st.columns(3)
-col1.metric("⏳ Tempo Médio de Espera", f"{df_filtrado['TEMPO_ESPERA_DIAS'].mean():.0f} dias")
-col2.metric("👥 Número de Pacientes", f"{len(df_filtrado)}")
-col3.metric("🏥 Unidades Hospitalares", f"{df_filtrado['COD_UNIDADE_HOSPITALAR'].nunique()}")
+    # Métricas principais
+    col1, col2, col3 = st.columns(3)
+    col1.metric("⏳ Tempo Médio de Espera", f"{df_filtrado['TEMPO_ESPERA_DIAS'].mean():.0f} dias")
+    col2.metric("👥 Número de Pacientes", f"{len(df_filtrado)}")
+    col3.metric("🏥 Unidades Hospitalares", f"{df_filtrado['COD_UNIDADE_HOSPITALAR'].nunique()}")
 
 st.markdown("---")
 
+# Boxplots: acima do limite, caixas calculadas no servidor e amostra dos pontos
+detalhe_disponivel = len(df_filtrado) <= LIMITE_DETALHE_COMPLETO
+detalhe_completo = st.sidebar.checkbox(
+    "Mostrar todos os pacientes nos boxplots",
+    value=False,
+    disabled=not detalhe_disponivel,
+    help=f"Disponível para seleções de até {LIMITE_DETALHE_COMPLETO} pacientes."
+) and detalhe_disponivel
+
 # Boxplot por faixa etária
 with st.expander("📊 Tempo de Espera por Faixa Etária"):
     st.markdown(
@@ -103,15 +77,17 @@ with st.expander("📊 Tempo de Espera por Faixa Etária"):
         Pode ajudar a identificar se há grupos etários com tempos sistematicamente maiores ou menores.
         """
     )
-    fig_faixa = px.box(
-        df_filtrado,
-        x='FAIXA_ETARIA',
-        y='TEMPO_ESPERA_DIAS',
-        points="all",
-        labels={'FAIXA_ETARIA': 'Faixa Etária', 'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'},
-        title="Tempo de Espera por Faixa Etária"
-    )
-    st.plotly_chart(fig_faixa, use_container_width=True)
+    with medir("Boxplot por faixa etária: figura"):
+        fig_faixa = figura_boxplot(
+            df_filtrado,
+            x='FAIXA_ETARIA',
+            y='TEMPO_ESPERA_DIAS',
+            detalhe_completo=detalhe_completo,
+            labels={'FAIXA_ETARIA': 'Faixa Etária', 'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'},
+            title="Tempo de Espera por Faixa Etária"
+        )
+    with medir("Boxplot por faixa etária: st.plotly_chart"):
+        st.plotly_chart(fig_faixa, use_container_width=True)
 
 # Boxplot por sexo
 with st.expander("📊 Tempo de Espera por Sexo"):
@@ -121,15 +97,17 @@ with st.expander("📊 Tempo de Espera por Sexo"):
         Útil para verificar se há diferenças de acesso associadas ao sexo.
         """
     )
-    fig_sexo = px.box(
-        df_filtrado,
-        x='SEXO',
-        y='TEMPO_ESPERA_DIAS',
-        points="all",
-        labels={'SEXO': 'Sexo', 'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'},
-        title="Tempo de Espera por Sexo"
-    )
-    st.plotly_chart(fig_sexo, use_container_width=True)
+    with medir("Boxplot por sexo: figura"):
+        fig_sexo = figura_boxplot(
+            df_filtrado,
+            x='SEXO',
+            y='TEMPO_ESPERA_DIAS',
+            detalhe_completo=detalhe_completo,
+            labels={'SEXO': 'Sexo', 'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'},
+            title="Tempo de Espera por Sexo"
+        )
+    with medir("Boxplot por sexo: st.plotly_chart"):
+        st.plotly_chart(fig_sexo, use_container_width=True)
 
 # Boxplot por raça/cor
 with st.expander("📊 Tempo de Espera por Raça/Cor"):
@@ -139,27 +117,24 @@ with st.expander("📊 Tempo de Espera por Raça/Cor"):
         Pode ser útil para identificar desigualdades ou padrões de acesso entre grupos.
         """
     )
-    fig_raca = px.box(
-        df_filtrado,
-        x='RACA_COR',
-        y='TEMPO_ESPERA_DIAS',
-        points="all",
-        labels={'RACA_COR': 'Raça/Cor', 'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'},
-        title="Tempo de Espera por Raça/Cor"
-    )
-    st.plotly_chart(fig_raca, use_container_width=True)
+    with medir("Boxplot por raça/cor: figura"):
+        fig_raca = figura_boxplot(
+            df_filtrado,
+            x='RACA_COR',
+            y='TEMPO_ESPERA_DIAS',
+            detalhe_completo=detalhe_completo,
+            labels={'RACA_COR': 'Raça/Cor', 'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)'},
+            title="Tempo de Espera por Raça/Cor"
+        )
+    with medir("Boxplot por raça/cor: st.plotly_chart"):
+        st.plotly_chart(fig_raca, use_container_width=True)
 
 # Amostra de dados
 with st.expander("📋 Mostrar dados filtrados"):
     st.dataframe(df_filtrado, use_container_width=True)
 
-# Exportar CSV
+# Exportar dados
 st.markdown("---")
 with st.expander("📥 Exportar dados filtrados"):
-    csv = df_filtrado.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="📄 Baixar CSV",
-        data=csv,
-        file_name='dados_filtrados_perfil.csv',
-        mime='text/csv'
-    )
+    # Arquivo gerado só ao clicar em baixar (ver exportacao.py)
+    botao_exportacao(df_filtrado, 'dados_filtrados_perfil')
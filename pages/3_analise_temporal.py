@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from filtro import load_and_filter_data
+from filtros_globais import barra_lateral_filtros, cubo_filtrado
+from agregados import series_mensais
+from perfil import iniciar_perfil, medir
+from hospitais import NOME_DESCONHECIDO
+from categorias import ROTULO_AUSENTE, categorias_presentes, mascara_categorias
 
 # --- Configuração da página ---
 st.set_page_config(
@@ -9,73 +13,26 @@ st.set_page_config(
     page_icon="📈",
     layout="wide"
 )
+iniciar_perfil("3_analise_temporal")
 
 st.title("📈 Análise Temporal e Perfis Clínicos do Tempo de Espera para FAV")
 
-# --- Mapeamento de código para nome dos hospitais ---
-codigo_hospital_nome = {
-    '2237253': 'Santa Casa de Porto Alegre',
-    '2237571': 'Nossa Senhora da Conceição',
-    '2237598': 'Divina Providência',
-    '2237601': 'Hospital de Clínicas de Porto Alegre',
-    '2262460': 'Vitarim Clínica do Rim',
-    '2262509': 'SER – Serviço de Doenças Renais',
-    '2262568': 'Hospital São Lucas da PUCRS',
-    '2262584': 'Clinirim',
-    '2262770': 'Centro de Diálise e Transplante',
-    '5844762': 'Instituto de Doenças Renais'
-}
-
-# --- Filtros Globais ---
-st.sidebar.header("Filtros Globais")
-
-df_base, opcoes_acesso, anos_disponiveis, meses_disponiveis = load_and_filter_data()
-df_base['COD_UNIDADE_HOSPITALAR'] = df_base['COD_UNIDADE_HOSPITALAR'].astype(str)
-df_base['NOME_HOSPITAL'] = df_base['COD_UNIDADE_HOSPITALAR'].map(codigo_hospital_nome).fillna("Desconhecido")
-
-# Filtros
-filtros_acesso = st.sidebar.multiselect(
-    "Tipo de Acesso Vascular Inicial",
-    options=opcoes_acesso,
-    default=[ac for ac in opcoes_acesso if "Fístula" in ac]
-)
-
-filtro_cronico = st.sidebar.checkbox(
-    "Apenas pacientes crônicos (≥ 3 meses de tratamento)",
-    value=True
-)
-
-ano_inicial, ano_final = st.sidebar.slider(
-    "Intervalo de Anos da Criação da FAV",
-    min_value=min(anos_disponiveis),
-    max_value=max(anos_disponiveis),
-    value=(min(anos_disponiveis), max(anos_disponiveis)),
-    step=1
-)
-
-meses_selecionados = st.sidebar.multiselect(
-    "Meses de Criação da FAV",
-    options=meses_disponiveis,
-    format_func=lambda x: f"{x:02d}",
-    default=meses_disponiveis
-)
+# --- Filtros globais (compartilhados entre as páginas) ---
+filtros = barra_lateral_filtros()
+filtros_acesso = filtros['acesso']
+filtro_cronico = filtros['cronico']
+ano_inicial, ano_final = filtros['anos']
+meses_selecionados = filtros['meses']
 
-# --- Aplicar filtros globais ---
-df, _, _, _ = load_and_filter_data(
-    filtro_acesso_default=False,
-    filtro_cronico_default=filtro_cronico,
-    filtros_acesso=filtros_acesso,
-    anos_selecionados=list(range(ano_inicial, ano_final + 1)),
-    meses_selecionados=meses_selecionados
-)
+# --- Aplicar filtros globais (sobre o cubo de agregados) ---
+with medir("Filtrar cubo"):
+    cubo = cubo_filtrado(filtros)
+    cubo = cubo[cubo['N'] > 0] if not cubo.empty else cubo
 
-if df.empty:
+if cubo.empty:
     st.warning("⚠️ Nenhum dado encontrado com os filtros selecionados.")
     st.stop()
 
-df['COD_UNIDADE_HOSPITALAR'] = df['COD_UNIDADE_HOSPITALAR'].astype(str)
-df['NOME_HOSPITAL'] = df['COD_UNIDADE_HOSPITALAR'].map(codigo_hospital_nome).fillna("Desconhecido")
-
 # --- Resumo dos filtros aplicados ---
 with st.sidebar.expander("📌 Resumo dos Filtros Aplicados"):
     st.markdown(f"**Acesso Vascular:** {', '.join(filtros_acesso) or 'Todos'}")
@@ -83,44 +40,59 @@ with st.sidebar.expander("📌 Resumo dos Filtros Aplicados"):
     st.markdown(f"**Anos:** {ano_inicial}–{ano_final}")
     st.markdown(f"**Meses:** {', '.join([f'{m:02d}' for m in meses_selecionados])}")
 
-st.markdown(f"**Pacientes após filtros globais:** {len(df)}")
+st.markdown(f"**Pacientes após filtros globais:** {int(cubo['N'].sum())}")
 
 # --- Filtros adicionais da página ---
 st.sidebar.header("Filtros Adicionais")
 
-hospital_options = sorted(df['COD_UNIDADE_HOSPITALAR'].unique())
-faixa_etaria_options = sorted(df['FAIXA_ETARIA'].astype(str).unique())
-sexo_options = sorted(df['SEXO'].astype(str).unique())
-raca_options = sorted(df['RACA_COR'].astype(str).unique())
+with medir("Opções dos filtros adicionais"):
+    # Nome de cada unidade já vem na base (dimensão do CNES aplicada em dados.py)
+    nome_hospital = dict(
+        cubo[['COD_UNIDADE_HOSPITALAR', 'NOME_HOSPITAL']].drop_duplicates().itertuples(index=False)
+    )
+    # Opções na ordem fixa das categorias (faixas etárias em ordem clínica),
+    # com ROTULO_AUSENTE para os pacientes sem valor na coluna
+    hospital_options = categorias_presentes(cubo['COD_UNIDADE_HOSPITALAR'], incluir_ausentes=True)
+    faixa_etaria_options = categorias_presentes(cubo['FAIXA_ETARIA'], incluir_ausentes=True)
+    sexo_options = categorias_presentes(cubo['SEXO'], incluir_ausentes=True)
+    raca_options = categorias_presentes(cubo['RACA_COR'], incluir_ausentes=True)
+
+def rotulo_hospital(codigo):
+    if codigo == ROTULO_AUSENTE:
+        return codigo
+    # Unidades fora da referência do CNES são distinguidas pelo código
+    nome = nome_hospital[codigo]
+    return f"{nome} ({codigo})" if nome == NOME_DESCONHECIDO else nome
 
 hospital_selec = st.sidebar.multiselect(
     "Hospital",
     options=hospital_options,
     default=hospital_options,
-    format_func=lambda x: codigo_hospital_nome.get(x, "Desconhecido")
+    format_func=rotulo_hospital
 )
 faixa_etaria_selec = st.sidebar.multiselect("Faixa Etária", faixa_etaria_options, default=faixa_etaria_options)
 sexo_selec = st.sidebar.multiselect("Sexo", sexo_options, default=sexo_options)
 raca_selec = st.sidebar.multiselect("Raça/Cor", raca_options, default=raca_options)
 
 # --- Aplicar filtros adicionais ---
-df_filt = df[
-    df['COD_UNIDADE_HOSPITALAR'].isin(hospital_selec) &
-    df['FAIXA_ETARIA'].astype(str).isin(faixa_etaria_selec) &
-    df['SEXO'].astype(str).isin(sexo_selec) &
-    df['RACA_COR'].astype(str).isin(raca_selec)
-].copy()
-
-if df_filt.empty:
+with medir("Aplicar filtros adicionais"):
+    # Comparação pelos códigos das categorias
+    cubo_filt = cubo[
+        mascara_categorias(cubo['COD_UNIDADE_HOSPITALAR'], hospital_selec) &
+        mascara_categorias(cubo['FAIXA_ETARIA'], faixa_etaria_selec) &
+        mascara_categorias(cubo['SEXO'], sexo_selec) &
+        mascara_categorias(cubo['RACA_COR'], raca_selec)
+    ]
+
+if cubo_filt.empty:
     st.warning("⚠️ Nenhum dado após aplicação dos filtros adicionais.")
     st.stop()
 
-# --- Preparar dados temporais ---
-df_filt['DATA_CRIACAO_FAV'] = pd.to_datetime(df_filt['DATA_CRIACAO_FAV'], errors='coerce')
-df_filt.dropna(subset=['DATA_CRIACAO_FAV'], inplace=True)
-df_filt['MES_ANO'] = df_filt['DATA_CRIACAO_FAV'].dt.to_period('M').dt.to_timestamp()
+st.markdown(f"**Pacientes após filtros adicionais:** {int(cubo_filt['N'].sum())}")
 
-st.markdown(f"**Pacientes após filtros adicionais:** {len(df_filt)}")
+# --- Séries mensais (geral e por perfil) em uma passada sobre o cubo ---
+with medir("Séries mensais"):
+    series = series_mensais(cubo_filt, ['SEXO', 'RACA_COR', 'FAIXA_ETARIA'])
 
 # --- Parâmetros de pandemia ---
 inicio_pandemia = pd.to_datetime("2020-03-01")
@@ -130,42 +102,42 @@ fim_pandemia = pd.to_datetime("2022-03-31")
 st.markdown("---")
 st.subheader("🗓️ Tempo Médio Mensal para Criação de FAV")
 
-df_tempo_mes = df_filt.groupby('MES_ANO')['TEMPO_ESPERA_DIAS'].mean().reset_index()
-
-fig_tempo = px.line(
-    df_tempo_mes,
-    x='MES_ANO',
-    y='TEMPO_ESPERA_DIAS',
-    title="Evolução do Tempo Médio para Criação da FAV (mensal)",
-    markers=True,
-    labels={'MES_ANO': 'Mês/Ano', 'TEMPO_ESPERA_DIAS': 'Tempo Médio (dias)'}
-)
+with medir("Evolução mensal: figura"):
+    fig_tempo = px.line(
+        series[None]['serie'],
+        x='MES_ANO',
+        y='TEMPO_ESPERA_DIAS',
+        title="Evolução do Tempo Médio para Criação da FAV (mensal)",
+        markers=True,
+        labels={'MES_ANO': 'Mês/Ano', 'TEMPO_ESPERA_DIAS': 'Tempo Médio (dias)'}
+    )
 
-# Adiciona pico
-pico = df_tempo_mes.loc[df_tempo_mes['TEMPO_ESPERA_DIAS'].idxmax()]
-fig_tempo.add_scatter(
-    x=[pico['MES_ANO']], y=[pico['TEMPO_ESPERA_DIAS']],
-    mode='markers+text',
-    marker=dict(size=12, color='green'),
-    text=[f"Pico: {pico['TEMPO_ESPERA_DIAS']:.0f}d"],
-    textposition="top center"
-)
+    # Adiciona pico
+    pico = series[None]['picos'].iloc[0]
+    fig_tempo.add_scatter(
+        x=[pico['MES_ANO']], y=[pico['TEMPO_ESPERA_DIAS']],
+        mode='markers+text',
+        marker=dict(size=12, color='green'),
+        text=[f"Pico: {pico['TEMPO_ESPERA_DIAS']:.0f}d"],
+        textposition="top center"
+    )
 
-# Pandemia
-fig_tempo.add_vrect(
-    x0=inicio_pandemia, x1=fim_pandemia,
-    fillcolor="red", opacity=0.2,
-    layer="below", line_width=0,
-    annotation_text="COVID-19", annotation_position="top left"
-)
+    # Pandemia
+    fig_tempo.add_vrect(
+        x0=inicio_pandemia, x1=fim_pandemia,
+        fillcolor="red", opacity=0.2,
+        layer="below", line_width=0,
+        annotation_text="COVID-19", annotation_position="top left"
+    )
 
-fig_tempo.update_layout(showlegend=False)
-st.plotly_chart(fig_tempo, use_container_width=True)
+    fig_tempo.update_layout(showlegend=False)
+with medir("Evolução mensal: st.plotly_chart"):
+    st.plotly_chart(fig_tempo, use_container_width=True)
 
 # --- Função para gráficos por subgrupos ---
-def grafico_temporal(df_grupo, grupo, titulo):
+def grafico_temporal(grupo, titulo):
     fig = px.line(
-        df_grupo,
+        series[grupo]['serie'],
         x='MES_ANO',
         y='TEMPO_ESPERA_DIAS',
         color=grupo,
@@ -174,19 +146,17 @@ def grafico_temporal(df_grupo, grupo, titulo):
         labels={'MES_ANO': 'Mês/Ano', 'TEMPO_ESPERA_DIAS': 'Tempo Médio (dias)', grupo: grupo}
     )
 
-    for categoria in df_grupo[grupo].unique():
-        df_c = df_grupo[df_grupo[grupo] == categoria]
-        if not df_c.empty:
-            idx = df_c['TEMPO_ESPERA_DIAS'].idxmax()
-            ponto = df_c.loc[idx]
-            fig.add_scatter(
-                x=[ponto['MES_ANO']],
-                y=[ponto['TEMPO_ESPERA_DIAS']],
-                mode='markers+text',
-                marker=dict(size=10),
-                text=[f"{categoria}: {ponto['TEMPO_ESPERA_DIAS']:.0f}d"],
-                textposition="top center"
-            )
+    # Picos já calculados por categoria em series_mensais
+    picos = series[grupo]['picos'][['MES_ANO', grupo, 'TEMPO_ESPERA_DIAS']]
+    for mes_ano, categoria, tempo in picos.itertuples(index=False):
+        fig.add_scatter(
+            x=[mes_ano],
+            y=[tempo],
+            mode='markers+text',
+            marker=dict(size=10),
+            text=[f"{categoria}: {tempo:.0f}d"],
+            textposition="top center"
+        )
 
     fig.add_vrect(
         x0=inicio_pandemia, x1=fim_pandemia,
@@ -202,13 +172,19 @@ st.markdown("---")
 st.subheader("👥 Análises por Perfil Clínico")
 
 # Sexo
-df_sexo = df_filt.groupby(['MES_ANO', 'SEXO'])['TEMPO_ESPERA_DIAS'].mean().reset_index()
-st.plotly_chart(grafico_temporal(df_sexo, 'SEXO', "Tempo Médio por Sexo"), use_container_width=True)
+with medir("Sexo: figura"):
+    fig_sexo = grafico_temporal('SEXO', "Tempo Médio por Sexo")
+with medir("Sexo: st.plotly_chart"):
+    st.plotly_chart(fig_sexo, use_container_width=True)
 
 # Raça/Cor
-df_raca = df_filt.groupby(['MES_ANO', 'RACA_COR'])['TEMPO_ESPERA_DIAS'].mean().reset_index()
-st.plotly_chart(grafico_temporal(df_raca, 'RACA_COR', "Tempo Médio por Raça/Cor"), use_container_width=True)
+with medir("Raça/cor: figura"):
+    fig_raca = grafico_temporal('RACA_COR', "Tempo Médio por Raça/Cor")
+with medir("Raça/cor: st.plotly_chart"):
+    st.plotly_chart(fig_raca, use_container_width=True)
 
 # Faixa Etária
-df_faixa = df_filt.groupby(['MES_ANO', 'FAIXA_ETARIA'])['TEMPO_ESPERA_DIAS'].mean().reset_index()
-st.plotly_chart(grafico_temporal(df_faixa, 'FAIXA_ETARIA', "Tempo Médio por Faixa Etária"), use_container_width=True)
+with medir("Faixa etária: figura"):
+    fig_faixa = grafico_temporal('FAIXA_ETARIA', "Tempo Médio por Faixa Etária")
+with medir("Faixa etária: st.plotly_chart"):
+    st.plotly_chart(fig_faixa, use_container_width=True)
@@ -1,60 +1,34 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from filtro import load_and_filter_data
+from filtros_globais import barra_lateral_filtros, dados_filtrados, cubo_filtrado
+from agregados import resumir_cubo
+from perfil import iniciar_perfil, medir
 
 st.set_page_config(page_title="Influência do Acesso Vascular Inicial", layout="wide")
+iniciar_perfil("5_acesso_vascular")
 
 st.markdown("# 5. O Acesso Vascular Inicial Influencia no Tempo de Espera para FAV?")
 st.markdown("### Pacientes em Diálise Crônica - Porto Alegre (2015–2024)")
 
-# --- Filtros globais na sidebar ---
-st.sidebar.header("Filtros Globais")
-
-df_raw, opcoes_acesso, anos_disponiveis, meses_disponiveis = load_and_filter_data()
-
-# Filtro: Tipo de Acesso Vascular Inicial
-filtros_acesso = st.sidebar.multiselect(
-    "Tipo de Acesso Vascular Inicial",
-    options=opcoes_acesso,
-    default=opcoes_acesso
-)
-
-# Filtro: Crônico
-filtro_cronico = st.sidebar.checkbox(
-    "Apenas pacientes crônicos (≥ 3 meses)",
-    value=True
-)
-
-# Filtro: Anos
-ano_min, ano_max = min(anos_disponiveis), max(anos_disponiveis)
-ano_inicial, ano_final = st.sidebar.slider(
-    "Intervalo de Anos da Criação da FAV",
-    min_value=ano_min,
-    max_value=ano_max,
-    value=(ano_min, ano_max)
-)
-
-# Filtro: Meses
-meses_selecionados = st.sidebar.multiselect(
-    "Meses da Criação da FAV",
-    options=meses_disponiveis,
-    format_func=lambda x: f"{x:02d}",
-    default=meses_disponiveis
-)
-
-# --- Aplicar filtros ---
-df, _, _, _ = load_and_filter_data(
-    filtros_acesso=filtros_acesso,
-    filtro_cronico_default=filtro_cronico,
-    anos_selecionados=list(range(ano_inicial, ano_final + 1)),
-    meses_selecionados=meses_selecionados
-)
+# --- Filtros globais (compartilhados entre as páginas) ---
+# Comparação entre acessos: todos os tipos, até o usuário escolher outros
+filtros = barra_lateral_filtros(todos_acessos_por_padrao=True)
+df = dados_filtrados(filtros)
 
 if df.empty:
     st.warning("⚠️ Nenhum dado encontrado com os filtros aplicados.")
     st.stop()
 
+# Os filtros valem para todas as páginas; esta comparação pede mais de um tipo de acesso
+if len(filtros['acesso']) < 2:
+    st.info("ℹ️ Selecione mais de um tipo de acesso vascular na barra lateral para comparar os grupos.")
+
+# Indicadores por tipo de acesso, somados a partir do cubo de agregados
+with medir("Indicadores por acesso (cubo)"):
+    cubo = cubo_filtrado(filtros)
+    resumo_acesso = resumir_cubo(cubo, por=['ACESSO_VASCULAR_INICIAL'])
+
 # --- Texto introdutório ---
 st.write("""
 Pacientes que iniciam a diálise com **cateteres temporários** geralmente o fazem de forma **urgente ou não planejada**, 
@@ -63,8 +37,10 @@ Esta análise avalia se o **tipo de acesso vascular inicial** está associado a
 """)
 
 # --- Distribuição por tipo de acesso inicial ---
-contagem_acesso = df['ACESSO_VASCULAR_INICIAL'].value_counts().reset_index()
-contagem_acesso.columns = ['Acesso Inicial', 'Número de Pacientes']
+with medir("Contagem por acesso"):
+    contagem_acesso = df['ACESSO_VASCULAR_INICIAL'].value_counts().reset_index()
+    contagem_acesso.columns = ['Acesso Inicial', 'Número de Pacientes']
+    contagem_acesso = contagem_acesso[contagem_acesso['Número de Pacientes'] > 0]
 
 col1, col2 = st.columns(2)
 
@@ -76,16 +52,18 @@ with col1:
     se mais pacientes iniciam com **cateteres temporários (urgência)** ou com **FAV (planejado)**.
     """)
 
-    fig_pie = px.pie(
-        contagem_acesso,
-        names='Acesso Inicial',
-        values='Número de Pacientes',
-        hole=0.3,
-        title="Distribuição por Tipo de Acesso Inicial",
-        color_discrete_sequence=px.colors.qualitative.Set3  # cores distintas e profissionais
-    )
-    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-    st.plotly_chart(fig_pie, use_container_width=True)
+    with medir("Pizza por acesso: figura"):
+        fig_pie = px.pie(
+            contagem_acesso,
+            names='Acesso Inicial',
+            values='Número de Pacientes',
+            hole=0.3,
+            title="Distribuição por Tipo de Acesso Inicial",
+            color_discrete_sequence=px.colors.qualitative.Set3  # cores distintas e profissionais
+        )
+        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+    with medir("Pizza por acesso: st.plotly_chart"):
+        st.plotly_chart(fig_pie, use_container_width=True)
 
 with col2:
     st.markdown("#### ⏱️ Tempo de Espera por Tipo de Acesso Vascular Inicial")
@@ -99,45 +77,37 @@ with col2:
     """)
 
     ordem_acessos = (
-        df.groupby('ACESSO_VASCULAR_INICIAL')['TEMPO_ESPERA_DIAS']
-        .median()
-        .sort_values(ascending=False)
-        .index.tolist()
+        resumo_acesso
+        .sort_values('Mediana', ascending=False)['ACESSO_VASCULAR_INICIAL']
+        .tolist()
     )
 
-    fig_box = px.box(
-        df,
-        x='ACESSO_VASCULAR_INICIAL',
-        y='TEMPO_ESPERA_DIAS',
-        points='outliers',
-        color='ACESSO_VASCULAR_INICIAL',
-        title="Tempo de Espera por Tipo de Acesso",
-        labels={
-            'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)',
-            'ACESSO_VASCULAR_INICIAL': 'Tipo de Acesso'
-        },
-        color_discrete_sequence=px.colors.qualitative.Dark24,
-        category_orders={'ACESSO_VASCULAR_INICIAL': ordem_acessos}
-    )
-    fig_box.update_layout(showlegend=False)
-    st.plotly_chart(fig_box, use_container_width=True)
+    with medir("Boxplot por acesso: figura"):
+        fig_box = px.box(
+            df,
+            x='ACESSO_VASCULAR_INICIAL',
+            y='TEMPO_ESPERA_DIAS',
+            points='outliers',
+            color='ACESSO_VASCULAR_INICIAL',
+            title="Tempo de Espera por Tipo de Acesso",
+            labels={
+                'TEMPO_ESPERA_DIAS': 'Tempo de Espera (dias)',
+                'ACESSO_VASCULAR_INICIAL': 'Tipo de Acesso'
+            },
+            color_discrete_sequence=px.colors.qualitative.Dark24,
+            category_orders={'ACESSO_VASCULAR_INICIAL': ordem_acessos}
+        )
+        fig_box.update_layout(showlegend=False)
+    with medir("Boxplot por acesso: st.plotly_chart"):
+        st.plotly_chart(fig_box, use_container_width=True)
 
 # --- Estatísticas descritivas ---
 st.markdown("### 📊 Estatísticas Descritivas por Tipo de Acesso Inicial")
 
 tabela_resumo = (
-    df.groupby("ACESSO_VASCULAR_INICIAL")["TEMPO_ESPERA_DIAS"]
-    .agg(
-        N_Pacientes="count",
-        Media="mean",
-        Mediana="median",
-        Desvio_Padrao="std",
-        P25=lambda x: x.quantile(0.25),
-        P75=lambda x: x.quantile(0.75),
-        Prop_Acima_180=lambda x: (x > 180).mean() * 100
-    )
+    resumo_acesso
+    .rename(columns={'N': 'N_Pacientes'})
     .round(1)
-    .reset_index()
 )
 
 st.dataframe(tabela_resumo)
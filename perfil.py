@@ -0,0 +1,90 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from filtro import estatisticas_cache_filtros
+
+# Modo de perfil do dashboard: ativado com PERFIL_DASHBOARD=1 ou com ?perfil=1 na
+# URL. Cada bloco medido com medir() aparece na barra lateral, com o tempo gasto
+# na execução atual do script, e é acrescentado ao log ARQUIVO_PERFIL (JSON Lines)
+# para análise posterior; o painel mostra também os contadores do cache de
+# filtros do processo. Desativado, medir() não registra nada.
+ARQUIVO_PERFIL = os.environ.get("ARQUIVO_PERFIL", "perfil_dashboard.jsonl")
+VALORES_ATIVO = ("1", "true", "sim")
+
+_lock_log = threading.Lock()
+
+def perfil_ativo():
+    if os.environ.get("PERFIL_DASHBOARD", "").lower() in VALORES_ATIVO:
+        return True
+    return st.query_params.get("perfil", "").lower() in VALORES_ATIVO
+
+class PerfilExecucao:
+    def __init__(self, pagina, sessao, execucao):
+        self.pagina = pagina
+        self.sessao = sessao
+        self.execucao = execucao
+        self.inicio = time.perf_counter()
+        self.blocos = []
+        self.painel = st.sidebar.empty()
+
+    def registrar(self, bloco, segundos):
+        self.blocos.append((bloco, segundos))
+        registro = {
+            'data_hora': datetime.now().isoformat(timespec='milliseconds'),
+            'pagina': self.pagina,
+            'sessao': self.sessao,
+            'execucao': self.execucao,
+            'bloco': bloco,
+            'segundos': round(segundos, 6),
+        }
+        with _lock_log, open(ARQUIVO_PERFIL, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        self.mostrar()
+
+    def mostrar(self):
+        # O painel é reescrito a cada bloco, pois a página pode parar (st.stop) antes do fim
+        decorrido = time.perf_counter() - self.inicio
+        tabela = pd.DataFrame(self.blocos, columns=['Bloco', 'ms'])
+        tabela['ms'] = (tabela['ms'] * 1000).round(1)
+        tabela['%'] = (tabela['ms'] / (decorrido * 1000) * 100).round(1)
+        with self.painel.container():
+            st.markdown("**⏱️ Perfil da execução**")
+            st.caption(f"Execução {self.execucao} · {decorrido * 1000:.0f} ms desde o início da página")
+            st.dataframe(tabela, hide_index=True, use_container_width=True)
+            cache = estatisticas_cache_filtros()
+            st.caption(
+                f"Cache de filtros: {cache['entradas']}/{cache['max_entradas']} entradas · "
+                f"{cache['acertos']} acertos · {cache['falhas']} falhas · "
+                f"{cache['remocoes']} remoções · {cache['expiracoes']} expirações"
+            )
+
+def iniciar_perfil(pagina):
+    # Chamado no início de cada página, logo após st.set_page_config
+    if not perfil_ativo():
+        st.session_state.pop('perfil_execucao', None)
+        return None
+    sessao = st.session_state.setdefault('perfil_sessao', uuid.uuid4().hex[:8])
+    execucao = st.session_state.get('perfil_contador', 0) + 1
+    st.session_state['perfil_contador'] = execucao
+    st.session_state['perfil_execucao'] = PerfilExecucao(pagina, sessao, execucao)
+    return st.session_state['perfil_execucao']
+
+@contextlib.contextmanager
+def medir(bloco):
+    perfil = st.session_state.get('perfil_execucao')
+    if perfil is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.registrar(bloco, time.perf_counter() - inicio)
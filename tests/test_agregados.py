@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from agregados import DIMENSOES_CUBO, construir_cubo, filtrar_cubo, resumir_cubo
+from categorias import ACESSOS_VASCULARES, FAIXAS_ETARIAS, RACAS_COR, SEXOS, aplicar_categorias
+
+def base_sintetica(n_pacientes=200_000, semente=0):
+    # Dois anos de dados de 3 unidades: muitos pacientes por célula do cubo
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({
+        'ANO_FAV': rng.choice([2022, 2023], n_pacientes),
+        'MES_FAV': rng.integers(1, 13, n_pacientes),
+        'ACESSO_VASCULAR_INICIAL': rng.choice(ACESSOS_VASCULARES[:2], n_pacientes),
+        'CRONICO_3_MESES': rng.random(n_pacientes) < 0.8,
+        'SEXO': rng.choice(SEXOS, n_pacientes),
+        'FAIXA_ETARIA': rng.choice(FAIXAS_ETARIAS, n_pacientes),
+        'RACA_COR': rng.choice(RACAS_COR[:3], n_pacientes),
+        'COD_UNIDADE_HOSPITALAR': rng.choice(['2232189', '2237601', '9999999'], n_pacientes),
+        'TEMPO_ESPERA_DIAS': rng.integers(-5, 800, n_pacientes).astype(float),
+    })
+    df.loc[rng.random(n_pacientes) < 0.02, 'FAIXA_ETARIA'] = np.nan
+    return aplicar_categorias(df)
+
+def test_cubo_tem_uma_linha_por_celula():
+    df = base_sintetica()
+    cubo = construir_cubo(df)
+    assert 'NOME_HOSPITAL' not in cubo.columns
+    assert len(cubo) == len(cubo.drop_duplicates(DIMENSOES_CUBO))
+    assert len(cubo) * 10 < len(df)
+
+def test_resumo_do_cubo_coincide_com_pacientes():
+    df = base_sintetica()
+    cubo = filtrar_cubo(construir_cubo(df), [ACESSOS_VASCULARES[0]], True, [2023], list(range(1, 13)))
+
+    validos = df[
+        (df['ACESSO_VASCULAR_INICIAL'] == ACESSOS_VASCULARES[0]) & df['CRONICO_3_MESES'] &
+        (df['ANO_FAV'] == 2023) & df['TEMPO_ESPERA_DIAS'].between(0, 730)
+    ]
+    dias = validos['TEMPO_ESPERA_DIAS']
+    resumo = resumir_cubo(cubo).iloc[0]
+    assert resumo['N'] == len(dias)
+    assert np.isclose(resumo['Media'], dias.mean())
+    assert np.isclose(resumo['Desvio_Padrao'], dias.std())
+    assert resumo['Mediana'] == dias.median()
+    assert resumo['P25'] == dias.quantile(0.25)
+    assert resumo['P75'] == dias.quantile(0.75)
+    assert np.isclose(resumo['Prop_Acima_180'], (dias > 180).mean() * 100)
+
+    por_faixa = resumir_cubo(cubo, por=['FAIXA_ETARIA'])
+    esperado = validos.groupby('FAIXA_ETARIA', observed=True)['TEMPO_ESPERA_DIAS'].median()
+    assert por_faixa['FAIXA_ETARIA'].tolist() == esperado.index.tolist()
+    assert np.allclose(por_faixa['Mediana'], esperado.to_numpy())
+
+def test_cubo_vazio():
+    cubo = construir_cubo(base_sintetica().iloc[:0])
+    assert cubo.empty
+    assert resumir_cubo(cubo).empty
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from categorias import (
+    FAIXAS_ETARIAS, ROTULO_AUSENTE, TIPOS_CATEGORICOS, categorias_presentes, mascara_categorias
+)
+
+def faixas(valores):
+    return pd.Series(valores, dtype=TIPOS_CATEGORICOS['FAIXA_ETARIA'])
+
+def test_categorias_presentes_em_ordem_clinica():
+    serie = faixas(['60+ anos', '18-30 anos', np.nan])
+    assert categorias_presentes(serie) == ['18-30 anos', '60+ anos']
+    assert categorias_presentes(serie, incluir_ausentes=True) == ['18-30 anos', '60+ anos', ROTULO_AUSENTE]
+    assert categorias_presentes(faixas(FAIXAS_ETARIAS), incluir_ausentes=True) == FAIXAS_ETARIAS
+
+def test_mascara_exclui_ausentes_nao_selecionados():
+    serie = faixas(['60+ anos', '60+ anos', np.nan, '18-30 anos'])
+    assert mascara_categorias(serie, ['60+ anos']).tolist() == [True, True, False, False]
+    assert mascara_categorias(serie, ['60+ anos', ROTULO_AUSENTE]).tolist() == [True, True, True, False]
+    assert not mascara_categorias(serie, []).any()
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dados
+
+def campos_chave():
+    return pd.DataFrame({
+        'AP_SEXO': pd.Categorical(['M', np.nan, ' M', 'F']),
+        'AP_RACACOR': pd.Categorical(['01', '01', np.nan, '03']),
+        'AP_CEPPCN': [' 90000000 ', '90000000', np.nan, '91000000'],
+        'AP_UFNACIO': pd.Categorical(['10', '10', '10', '10']),
+    })
+
+def test_chave_igual_a_normalizacao_linha_a_linha():
+    df = campos_chave()
+    esperado = pd.util.hash_pandas_object(dados.normalizar_campos_chave(df), index=False).to_numpy()
+    assert (dados.criar_chave_composta_robusta(df.copy())['CHAVE_COMPOSTA'].to_numpy() == esperado).all()
+
+def test_colisao_de_chave_interrompe(monkeypatch):
+    dados.verificar_colisoes_chave(campos_chave(), campos_chave().iloc[:0])
+    # Hash constante: combinações distintas passam a colidir
+    monkeypatch.setattr(pd.util, 'hash_pandas_object', lambda df, index: pd.Series(np.zeros(len(df), dtype='uint64')))
+    with pytest.raises(ValueError):
+        dados.verificar_colisoes_chave(campos_chave())
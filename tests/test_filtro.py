@@ -0,0 +1,26 @@
+import os
+import shutil
+
+import filtro
+from manifesto import gravar_manifesto
+
+BASE_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados_finais_para_dashboard.csv')
+
+def test_assinatura_muda_quando_o_csv_e_regravado_sem_manifesto(tmp_path):
+    caminho = str(tmp_path / 'dados_finais_para_dashboard.csv')
+    shutil.copy(BASE_EXEMPLO, caminho)
+    df = filtro.ler_base_dashboard(caminho)
+    manifesto = gravar_manifesto(df, caminho)
+    # Manifesto gravado depois do CSV, como em dados.py
+    os.utime(caminho, (1_000_000, 1_000_000))
+    os.utime(manifesto, (2_000_000, 2_000_000))
+
+    filtro.carregar_manifesto.clear()
+    assinatura = filtro.assinatura_base(caminho)
+    assert assinatura == filtro.manifesto_base(caminho)['hash_conteudo']
+
+    # CSV substituído sem novo manifesto
+    df.head(10).to_csv(caminho, index=False)
+    os.utime(caminho, (3_000_000, 3_000_000))
+    assert filtro.manifesto_base(caminho) is None
+    assert filtro.assinatura_base(caminho) != assinatura
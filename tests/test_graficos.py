@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from graficos import boxplot_altair, estatisticas_boxplot, figura_boxplot, figura_histograma, histograma
+
+FAIXAS = ['18-30 anos', '31-45 anos']
+
+def pacientes(faixas):
+    return pd.DataFrame({
+        'FAIXA_ETARIA': pd.Categorical(faixas, categories=FAIXAS),
+        'TEMPO_ESPERA_DIAS': np.arange(len(faixas), dtype=float),
+    })
+
+@pytest.mark.parametrize('df', [pacientes([np.nan] * 3), pacientes([])], ids=['grupo_ausente', 'vazio'])
+def test_boxplot_sem_grupos(df):
+    estatisticas = estatisticas_boxplot(df.dropna(), 'FAIXA_ETARIA', 'TEMPO_ESPERA_DIAS')
+    assert estatisticas.empty
+    assert estatisticas.index.name == 'FAIXA_ETARIA'
+
+    figura_boxplot(df, 'FAIXA_ETARIA', 'TEMPO_ESPERA_DIAS')
+    figura_boxplot(df, 'FAIXA_ETARIA', 'TEMPO_ESPERA_DIAS', detalhe_completo=True)
+    boxplot_altair(df, 'FAIXA_ETARIA', 'TEMPO_ESPERA_DIAS').to_dict()
+
+def test_boxplot_ignora_grupo_ausente():
+    estatisticas = estatisticas_boxplot(
+        pacientes(['18-30 anos', '18-30 anos', np.nan]).dropna(), 'FAIXA_ETARIA', 'TEMPO_ESPERA_DIAS'
+    )
+    assert estatisticas.index.tolist() == ['18-30 anos']
+    assert estatisticas.loc['18-30 anos', 'n'] == 2
+
+def test_histograma_vazio():
+    classes = histograma(pd.Series([], dtype=float))
+    assert classes.empty
+    figura_histograma(pacientes([]), 'TEMPO_ESPERA_DIAS')